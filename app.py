@@ -1,5 +1,6 @@
 import sys
-import subprocess
+import time
+import importlib
 from PyQt5.QtWidgets import QApplication, QLabel, QHBoxLayout, QVBoxLayout, QWidget
 from PyQt5.QtGui import QPixmap, QImage
 from PyQt5.QtCore import Qt
@@ -37,13 +38,14 @@ class LogoWindow(QWidget):
 
         main_layout = QHBoxLayout()
 
-
-        # Define the images and python files mapping
-        self.python_scripts = {
-            'basic_logo.png': 'basicFilters.py',
-            'insta_logo.png': 'instaFilters.py',
-            'apple_logo.png': 'iphoneFilters.py'
+        # The filter apps open as windows of this process; each app module is
+        # imported on its first click only
+        self.apps = {
+            'basic_logo.png': ('basicFilterApp', 'BasicFilterApp'),
+            'insta_logo.png': ('instaFilterApp', 'InstaFilterApp'),
+            'apple_logo.png': ('iphoneFilterApp', 'IphoneFilterApp')
         }
+        self.windows = []
 
         # Create labels for each image
         self.apple_logo = QLabel(self)
@@ -79,21 +81,42 @@ class LogoWindow(QWidget):
         main_layout.addLayout(insta_layout)
         main_layout.addLayout(apple_layout)
 
-        self.setLayout(main_layout)
+        # Startup times of the apps opened from here
+        self.status_label = QLabel(alignment=Qt.AlignCenter)
+        outer_layout = QVBoxLayout()
+        outer_layout.addLayout(main_layout)
+        outer_layout.addWidget(self.status_label)
+
+        self.setLayout(outer_layout)
 
     def set_image(self, label, image_path):
         resized_image = resize_image(image_path, size=(100, 100))
         pixmap = pil_to_pixmap(resized_image)
         label.setPixmap(pixmap)
         label.setAlignment(Qt.AlignCenter)
-        label.mousePressEvent = lambda event, path=image_path: self.run_python_script(path)
-
-    def run_python_script(self, image_path):
-        script_path = self.python_scripts.get(image_path)
-        if script_path:
-            subprocess.run(['python3', script_path])
-        else:
-            print(f"Script for {image_path} not found.")
+        label.mousePressEvent = lambda event, path=image_path: self.open_app(path)
+
+    def open_app(self, image_path):
+        app = self.apps.get(image_path)
+        if app is None:
+            print(f"App for {image_path} not found.")
+            return
+        module_name, class_name = app
+
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        imported = time.perf_counter()
+        window = getattr(module, class_name)()
+        window.first_frame.connect(lambda: self.report(class_name, f"first frame after {time.perf_counter() - started:.2f} s"))
+        window.setAttribute(Qt.WA_DeleteOnClose)
+        window.destroyed.connect(lambda _=None: self.windows.remove(window))
+        window.show()
+        self.windows.append(window)
+        self.report(class_name, f"import {imported - started:.2f} s, window after {time.perf_counter() - started:.2f} s")
+
+    def report(self, app_name, text):
+        print(f"{app_name}: {text}")
+        self.status_label.setText(f"{app_name}: {text}")
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
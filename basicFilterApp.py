@@ -0,0 +1,198 @@
+import sys
+import cv2
+import datetime
+from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QGridLayout, QLabel, QVBoxLayout
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import Qt, pyqtSignal
+from filterEngine import scratch_stats, ImagePyramid, TemporalCache
+from basicFilters import FILTERS, apply_filter
+from cameraCapture import CameraCapture
+from tileRenderer import TileRenderer
+from qtBridge import FrameDisplay, MetricsOverlay, to_qimage
+from exportQueue import ExportQueue, BURST_FRAMES
+from metrics import Metrics
+from frameScheduler import FrameScheduler
+from dirtyRegions import IncrementalOutputs
+import multiFilter
+
+class BasicFilterApp(QWidget):
+    first_frame = pyqtSignal()  # Emitted once, when the first tile is on screen
+
+    def __init__(self):
+        super().__init__()
+        self.frame_shown = False
+        self.init_ui()
+        # Tiles are filtered concurrently; OpenCV releases the GIL while it works.
+        # Each tile reads its filter from the frame's shared FrameGraph, and only
+        # re-filters the parts of the picture that changed since its last frame
+        self.incremental = IncrementalOutputs.from_env()
+        self.renderer = TileRenderer([lambda graph, name=name: self.incremental.output(graph, name)
+                                      for name in self.filters], budget_ms=30)
+        self.renderer.tile_ready.connect(self.show_tile)
+        self.display = FrameDisplay()
+        # Saves are filtered and encoded on writer threads, off the GUI thread
+        self.exporter = ExportQueue()
+        self.exporter.exported.connect(self.on_exported)
+        self.cap = CameraCapture(0)  # Capture from the default camera on a background thread
+        # Frames are scheduled against a 30 ms budget; under load the grid is
+        # refreshed less often, then rendered smaller, before the selected tile slows
+        self.scheduler = FrameScheduler.from_env(self.update_frame, target_ms=30)
+        # Filter timings, FPS and missed ticks; off unless FILTER_METRICS is set
+        self.metrics = Metrics.from_env(target_interval_ms=self.scheduler.target * 1000)
+        self.overlay = MetricsOverlay.attach(self, self.metrics)
+        # Portrait Mode's mask is reused while the camera picture stays still,
+        # and blended with the previous one on refresh so it does not flicker
+        self.temporal = {"portrait_mask": TemporalCache(refresh_every=10, smoothing=0.5)}
+        self.scheduler.start()
+
+    def init_ui(self):
+        self.setWindowTitle('Basic Filters')
+        self.setGeometry(100, 100, 1000, 700)
+
+        self.grid = QGridLayout()
+        self.setLayout(self.grid)
+
+        # List of filters
+        self.filters = list(FILTERS)
+
+        # Create labels to display the filters
+        self.labels = []
+        self.selected_filter_index = 0  # Default selected filter is the first one
+
+        for i in range(15):
+            vbox = QVBoxLayout()  # Vertical layout to hold image and text
+            label = QLabel(self)
+            label.setFixedSize(150, 150)
+            label.setStyleSheet("border: 1px solid black;")  # Border for all filters
+            label.mousePressEvent = lambda event, idx=i: self.filter_selected(idx)
+
+            # Text below the filter
+            filter_text = QLabel(self.filters[i], alignment=Qt.AlignCenter)
+            filter_text.setStyleSheet("font-size: 14px; color: white;")
+
+            # Create a widget to hold the layout
+            filter_widget = QWidget(self)
+            filter_layout = QVBoxLayout(filter_widget)
+            filter_layout.addWidget(label)
+            filter_layout.addWidget(filter_text)
+
+            self.labels.append(label)
+            self.grid.addWidget(filter_widget, i // 5, i % 5)  # Add the widget to the grid layout
+
+        # Create a Save Button
+        self.save_button = QPushButton('Save', self)
+        self.save_button.clicked.connect(self.save_filter)
+        self.grid.addWidget(self.save_button, 3, 2, alignment=Qt.AlignCenter)
+
+        # Burst button: saves the next frames in a row
+        self.burst_button = QPushButton(f'Burst ({BURST_FRAMES})', self)
+        self.burst_button.clicked.connect(self.save_burst)
+        self.grid.addWidget(self.burst_button, 3, 3, alignment=Qt.AlignCenter)
+
+        # Export progress, shown without interrupting the preview
+        self.status_label = QLabel(self, alignment=Qt.AlignCenter)
+        self.grid.addWidget(self.status_label, 4, 0, 1, 5)
+
+        # Highlight the original (first) filter with a green box
+        self.update_highlight()
+
+    def update_frame(self):
+        """Capture the frame from the camera and display the selected filter."""
+        self.metrics.tick(camera_dropped=self.cap.dropped, scheduler_level=self.scheduler.level,
+                          portrait_mask_hit_rate=round(self.temporal["portrait_mask"].hit_rate, 2),
+                          reuse_ratio=round(self.incremental.reuse_ratio(), 2), tile_errors=self.renderer.errors,
+                          scratch_mb=round(scratch_stats()["bytes"] / 2 ** 20, 1))
+        ret, frame = self.cap.read()  # Newest frame, or nothing new since the last tick
+        if ret and frame is not None:
+            # The tiles are filtered on a 200x200 proxy taken from the frame's pyramid
+            # (smaller under load), with blur sizes scaled to match; saving renders at
+            # full resolution
+            size = int(200 * self.scheduler.proxy)
+            frame, scale = ImagePyramid(frame).proxy((size, size))
+            frame = cv2.flip(frame, 1)
+
+            # Filter every due tile on the worker pool; the selected one is never skipped.
+            # Pencil Sketch and HDR preview with their fast tier
+            graph = multiFilter.FrameGraph(frame, scale=scale, metrics=self.metrics, tier="fast",
+                                           temporal=self.temporal)
+            self.renderer.throttle = self.scheduler.thumbnail_every
+            self.renderer.render(graph, priority=self.selected_filter_index, stamp=self.cap.captured_at)
+            self.scheduler.report(self.renderer.load())
+
+    def show_tile(self, index, filter_frame, captured_at):
+        """Display a tile as soon as its worker has finished it."""
+        if filter_frame is None:
+            self.labels[index].setText("Filter failed")  # The renderer printed the error
+            return
+        if filter_frame.shape[0] != 200:
+            filter_frame = cv2.resize(filter_frame, (200, 200))  # Rendered at a reduced proxy size
+        self.display.show(self.labels[index], filter_frame)
+        if not self.frame_shown:
+            self.frame_shown = True
+            self.first_frame.emit()
+        if index == self.selected_filter_index:
+            self.metrics.frame_done(captured_at)
+
+    def convert_cv_qt(self, cv_img):
+        """Convert from OpenCV image format to QPixmap"""
+        if cv_img is not None:
+            # Gray, BGR and BGRA frames are wrapped as they are, without a channel swap
+            return QPixmap.fromImage(to_qimage(cv_img))
+        return QPixmap()
+
+    def filter_selected(self, index):
+        """Handle filter selection and highlight"""
+        self.selected_filter_index = index
+        self.update_highlight()
+
+    def update_highlight(self):
+        """Update the green highlight on the selected filter"""
+        for i, label in enumerate(self.labels):
+            if i == self.selected_filter_index:
+                label.setStyleSheet("border: 3px solid green;")  # Green border for selected
+            else:
+                label.setStyleSheet("border: 1px solid black;")  # Black border for others
+
+    def save_filter(self):
+        """Queue the current frame with the selected filter for saving"""
+        ret, frame = self.cap.latest()  # Same frame the preview is showing
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        if ret:
+            filter_name = self.filters[self.selected_filter_index]
+            filename = self.exporter.submit(frame, self.full_resolution_render(filter_name), f"{filter_name}_{timestamp}")
+            self.status_label.setText(f"Saving {filename}..." if filename else "Still saving, try again in a moment")
+
+    def save_burst(self):
+        """Save the next BURST_FRAMES frames with the selected filter"""
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filter_name = self.filters[self.selected_filter_index]
+        self.exporter.burst(self.cap, BURST_FRAMES, self.full_resolution_render(filter_name), f"{filter_name}_{timestamp}")
+        self.status_label.setText(f"Saving a burst of {BURST_FRAMES} frames...")
+
+    @staticmethod
+    def full_resolution_render(filter_name):
+        # Runs on a writer thread, on the camera frame as captured
+        return lambda frame: apply_filter(cv2.flip(frame, 1), filter_name)
+
+    def on_exported(self, filename, error):
+        """Report a finished save (called on the GUI thread)"""
+        if error is None:
+            self.status_label.setText(f"Image saved as {filename}")
+            print(f"Filter saved as {filename}")
+        else:
+            self.status_label.setText(f"Could not save {filename}: {error}")
+
+    def closeEvent(self, event):
+        self.scheduler.stop()
+        self.renderer.shutdown()
+        self.exporter.shutdown()  # Let queued saves finish
+        self.cap.release()
+
+def main():
+    app = QApplication(sys.argv)
+    window = BasicFilterApp()
+    window.show()
+    sys.exit(app.exec_())
+
+if __name__ == '__main__':
+    main()
@@ -1,117 +1,213 @@
-import sys
 import cv2
 import numpy as np
-import datetime
-from scipy.interpolate import UnivariateSpline
-from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QGridLayout, QLabel, QVBoxLayout, QMessageBox
-from PyQt5.QtGui import QImage, QPixmap, QPainter, QColor
-from PyQt5.QtCore import Qt, QRect, QTimer
+import functools
+from filterEngine import compile_lut, scale_abs_lut, apply_lut, scratch, cached_constant, scaled_gaussian
 
-def verify_alpha_channel(frame):
+def verify_alpha_channel(frame, out=None):
     try:
         frame.shape[3] # looking for the alpha channel
     except IndexError:
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=out)
     return frame
 
-def apply_sketch(image):
-    img_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    img_gray_blur = cv2.GaussianBlur(img_gray, (5,5), 0)
-    canny_edges = cv2.Canny(img_gray_blur, 10, 70)
-    ret, mask = cv2.threshold(canny_edges, 70, 255, cv2.THRESH_BINARY_INV)
+def _bgra_shape(image):
+    return image.shape[:2] + (4,)
+
+def _fresh_bgra(image, bgra, out):
+    # A BGRA copy of the frame that the filter can draw on and return
+    if bgra is None:
+        return verify_alpha_channel(image, out)
+    if out is None:
+        return bgra.copy()
+    np.copyto(out, bgra)
+    return out
+
+# Every filter takes an optional `out` array to write its result into.
+# Intermediates that never leave a filter live in per-thread scratch buffers,
+# and data that only depends on the resolution is built once, so a loop that
+# passes `out` does not allocate per frame.
+#
+# The optional gray/bgra/blured arguments take intermediates that were already
+# computed for the same frame (see multiFilter.apply_many). They are read-only.
+#
+# Blur, Portrait Mode and HDR have parameters in pixels (blur kernels,
+# sigma_s) and take a `scale`: the image's size relative to the
+# full-resolution one, so that a proxy-resolution preview looks like the
+# saved result.
+#
+# Pencil Sketch and HDR also take a quality `tier`. "exact" is the filter as
+# it always was; "fast" runs the expensive part on a half-size copy
+# (FAST_DOWNSCALE) and brings the result back to full size, for live
+# previews. Saving always uses "exact". benchFilters.py reports each fast
+# tier's speedup and its error against the exact output. Sketch has no
+# fast tier: its output is one-pixel edges, which a half-size pass moves
+# or doubles (about 13 dB PSNR) for a 1.6x gain, and Canny is cheap anyway.
+
+TIERS = ("exact", "fast")
+TIERED_FILTERS = ("Pencil Sketch", "HDR")
+FAST_DOWNSCALE = 2
+
+def _reduced(image, tag):
+    h, w = image.shape[:2]
+    size = (max(1, w // FAST_DOWNSCALE), max(1, h // FAST_DOWNSCALE))
+    return cv2.resize(image, size, dst=scratch(tag, size[::-1] + image.shape[2:], image.dtype),
+                      interpolation=cv2.INTER_AREA)
+
+def apply_sketch(image, gray=None, out=None):
+    shape = image.shape[:2]
+    img_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=scratch("gray", shape)) if gray is None else gray
+    img_gray_blur = cv2.GaussianBlur(img_gray, (5,5), 0, dst=scratch("gray_blur", shape))
+    canny_edges = cv2.Canny(img_gray_blur, 10, 70, edges=scratch("edges", shape))
+    ret, mask = cv2.threshold(canny_edges, 70, 255, cv2.THRESH_BINARY_INV, dst=out)
     return mask
 
-def apply_HSVFilter(image):
-    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    h, s, v = cv2.split(hsv_image)
-    s.fill(199)
-    v.fill(255)
-    hsv_image = cv2.merge([h, s, v])
-    out = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR)
-    frame = verify_alpha_channel(image)
-    out = verify_alpha_channel(out)
-    cv2.addWeighted(out, 0.25, frame, 1.0, .23, frame)
+def apply_HSVFilter(image, bgra=None, out=None):
+    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=scratch("hsv", image.shape))
+    hsv_image[:, :, 1] = 199  # saturation
+    hsv_image[:, :, 2] = 255  # value
+    tinted = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR, dst=scratch("tinted", image.shape))
+    tinted = verify_alpha_channel(tinted, scratch("tinted_bgra", _bgra_shape(image)))
+    frame = _fresh_bgra(image, bgra, out)
+    cv2.addWeighted(tinted, 0.25, frame, 1.0, .23, frame)
     return frame
 
-def apply_sepia(image):
-    # Apply sepia filter
-    sepia_filter = np.array([[0.272, 0.534, 0.131],[0.349, 0.686, 0.168],[0.393, 0.769, 0.189]])
-    filtered_img = cv2.transform(image, sepia_filter)
-    filtered_img = np.clip(filtered_img, 0, 255).astype(np.uint8)
+SEPIA_MATRIX = np.array([[0.272, 0.534, 0.131],[0.349, 0.686, 0.168],[0.393, 0.769, 0.189]])
+
+def apply_sepia(image, out=None):
+    # Apply sepia filter; cv2.transform already saturates to uint8
+    filtered_img = cv2.transform(image, SEPIA_MATRIX, dst=out)
     return filtered_img
 
-def apply_color_overlay(image):
-    frame = verify_alpha_channel(image)
+def apply_color_overlay(image, bgra=None, out=None):
+    frame = _fresh_bgra(image, bgra, out)
     intensity=0.5
     blue=0
     green=231
     red=123
     frame_h, frame_w, frame_c = frame.shape
     sepia_bgra = (blue, green, red, 1)
-    overlay = np.full((frame_h, frame_w, 4), sepia_bgra, dtype='uint8')
+    overlay = cached_constant(("color_overlay", frame_h, frame_w),
+                              lambda: np.full((frame_h, frame_w, 4), sepia_bgra, dtype='uint8'))
     cv2.addWeighted(overlay, intensity, frame, 1.0, 0, frame)
     return frame
 
-def apply_invert(img):
-    return cv2.bitwise_not(img)
-
-def alpha_blend(frame_1, frame_2, mask):
-    alpha = mask/255.0 
-    blended = cv2.convertScaleAbs(frame_1*(1-alpha) + frame_2*alpha)
-    return blended
-
-def apply_blur(image):
-    frame = verify_alpha_channel(image)
-    frame_h, frame_w, frame_c = frame.shape
+def apply_invert(img, out=None):
+    return cv2.bitwise_not(img, dst=out)
+
+def alpha_blend(frame_1, frame_2, mask, out=None):
+    alpha = np.divide(mask, 255.0, out=scratch("alpha", mask.shape, np.float64))
+    inverse = np.subtract(1, alpha, out=scratch("inverse_alpha", mask.shape, np.float64))
+    return _blend(frame_1, frame_2, alpha, inverse, out)
+
+def _blend(frame_1, frame_2, alpha, inverse, out=None):
+    # frame_1*(1-alpha) + frame_2*alpha, in float64 scratch buffers
+    blended = np.multiply(frame_1, inverse, out=scratch("blend_1", frame_1.shape, np.float64))
+    weighted = np.multiply(frame_2, alpha, out=scratch("blend_2", frame_2.shape, np.float64))
+    np.add(blended, weighted, out=blended)
+    return cv2.convertScaleAbs(blended, dst=out)
+
+def vignette_weights(frame_h, frame_w, region=None, scale=1.0):
+    # region=(top, left, height, width) builds the weights of that part of
+    # a frame_h x frame_w frame only, for tiled processing
+    top, left, height, width = region or (0, 0, frame_h, frame_w)
     y = int(frame_h/2)
     x = int(frame_w/2)
-    intensity=0.2
+    mask = np.zeros((height, width, 4), dtype='uint8')
+    cv2.circle(mask, (x - left, y - top), int(y/2), (255,255,255), -1, cv2.LINE_AA)
+    mask = cv2.GaussianBlur(mask, *scaled_gaussian(21, 11, scale))
+    alpha = (255-mask)/255.0
+    return alpha, 1-alpha
+
+def apply_blur(image, bgra=None, blured=None, out=None, vignette=None, scale=1.0):
+    frame = verify_alpha_channel(image, scratch("bgra", _bgra_shape(image))) if bgra is None else bgra
+    frame_h, frame_w, frame_c = frame.shape
 
-    mask = np.zeros((frame_h, frame_w, 4), dtype='uint8')
-    cv2.circle(mask, (x, y), int(y/2), (255,255,255), -1, cv2.LINE_AA)
-    mask = cv2.GaussianBlur(mask, (21,21),11 )
+    # The vignette mask only depends on the resolution
+    if vignette is None:
+        vignette = cached_constant(("blur_vignette", frame_h, frame_w, scale),
+                                   lambda: vignette_weights(frame_h, frame_w, scale=scale))
+    alpha, inverse = vignette
 
-    blured = cv2.GaussianBlur(frame, (21,21), 11)
-    blended = alpha_blend(frame, blured, 255-mask)
-    frame = cv2.cvtColor(blended, cv2.COLOR_BGRA2BGR)
+    if blured is None:
+        blured = cv2.GaussianBlur(frame, *scaled_gaussian(21, 11, scale), dst=scratch("bgra_blur", frame.shape))
+    blended = _blend(frame, blured, alpha, inverse, scratch("blended", frame.shape))
+    frame = cv2.cvtColor(blended, cv2.COLOR_BGRA2BGR, dst=out)
     return frame
 
-def apply_portrait_mode(image):
-    frame = verify_alpha_channel(image)
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    _, mask = cv2.threshold(gray, 120,255,cv2.THRESH_BINARY)
+def portrait_mask(gray, out=None):
+    # Bright pixels are the subject and stay sharp; a video loop can reuse
+    # this mask across frames (see multiFilter.FrameGraph's `temporal`)
+    _, mask = cv2.threshold(gray, 120,255,cv2.THRESH_BINARY, dst=out)
+    return mask
 
-    mask = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGRA)
-    blured = cv2.GaussianBlur(frame, (21,21), 11)
-    blended = alpha_blend(frame, blured, mask)
-    frame = cv2.cvtColor(blended, cv2.COLOR_BGRA2BGR)
+def apply_portrait_mode(image, gray=None, bgra=None, blured=None, out=None, scale=1.0, mask=None):
+    frame = verify_alpha_channel(image, scratch("bgra", _bgra_shape(image))) if bgra is None else bgra
+    if mask is None:
+        if gray is None:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=scratch("gray", image.shape[:2]))
+        mask = portrait_mask(gray, scratch("mask", gray.shape))
+
+    mask = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGRA, dst=scratch("mask_bgra", frame.shape))
+    if blured is None:
+        blured = cv2.GaussianBlur(frame, *scaled_gaussian(21, 11, scale), dst=scratch("bgra_blur", frame.shape))
+    blended = alpha_blend(frame, blured, mask, scratch("blended", frame.shape))
+    frame = cv2.cvtColor(blended, cv2.COLOR_BGRA2BGR, dst=out)
     return frame
 
-def apply_greyscale(image):
-    greyscale = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    return greyscale
+def apply_greyscale(image, gray=None, out=None):
+    if gray is None:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=out)
+    if out is None:
+        return gray
+    np.copyto(out, gray)
+    return out
 
-def apply_brightness(image):
-    img_bright = cv2.convertScaleAbs(image, beta=60)
+def apply_brightness(image, out=None):
+    img_bright = apply_lut(image, scale_abs_lut(1.0, 60), out)
     return img_bright
 
-def apply_sharpen(image):
-    kernel = np.array([[-1, -1, -1], [-1, 9.5, -1], [-1, -1, -1]])
-    img_sharpen = cv2.filter2D(image, -1, kernel)
+SHARPEN_KERNEL = np.array([[-1, -1, -1], [-1, 9.5, -1], [-1, -1, -1]])
+
+def apply_sharpen(image, out=None):
+    img_sharpen = cv2.filter2D(image, -1, SHARPEN_KERNEL, dst=out)
     return img_sharpen
 
-def apply_pencil_sketch(image):
-    sk_gray, sk_color = cv2.pencilSketch(image, sigma_s=60, sigma_r=0.07, shade_factor=0.1) 
+def apply_pencil_sketch(image, out=None, tier="exact"):
+    if tier == "fast":
+        # Half-size sketch with the smoothing radius halved to match, resized back up
+        small = _reduced(image, "sketch_small")
+        sk_gray, sk_color = cv2.pencilSketch(small, dst1=scratch("sketch_gray", small.shape[:2]),
+                                             dst2=scratch("sketch_color", small.shape),
+                                             sigma_s=60 / FAST_DOWNSCALE, sigma_r=0.07, shade_factor=0.1)
+        return cv2.resize(sk_gray, image.shape[1::-1], dst=out, interpolation=cv2.INTER_LINEAR)
+    sk_gray, sk_color = cv2.pencilSketch(image, dst1=out, dst2=scratch("sketch_color", image.shape),
+                                         sigma_s=60, sigma_r=0.07, shade_factor=0.1)
     return  sk_gray
 
-def apply_HDR(image):
-    hdr = cv2.detailEnhance(image, sigma_s=12, sigma_r=0.15)
+def apply_HDR(image, out=None, scale=1.0, tier="exact"):
+    if tier == "fast":
+        # Enhance a half-size copy and add only the detail it gained back onto
+        # the full-size image, so edges stay as sharp as the input's
+        small = _reduced(image, "hdr_small")
+        enhanced = cv2.detailEnhance(small, dst=scratch("hdr_enhanced", small.shape),
+                                     sigma_s=12 * scale / FAST_DOWNSCALE, sigma_r=0.15)
+        detail = cv2.subtract(enhanced, small, dst=scratch("hdr_detail", small.shape, np.int16), dtype=cv2.CV_16S)
+        detail = cv2.resize(detail, image.shape[1::-1], dst=scratch("hdr_detail_full", image.shape, np.int16),
+                            interpolation=cv2.INTER_LINEAR)
+        return cv2.add(image, detail, dst=out, dtype=cv2.CV_8U)
+    hdr = cv2.detailEnhance(image, dst=out, sigma_s=12 * scale, sigma_r=0.15)
     return  hdr
 def LookupTable(x, y):
+  return _spline_table(tuple(x), tuple(y))
+
+@functools.lru_cache(maxsize=None)
+def _spline_table(x, y):
+  # scipy takes longer to import than the rest of the app; only Summer and Winter need it
+  from scipy.interpolate import UnivariateSpline
   spline = UnivariateSpline(x, y)
   return spline(range(256))
 
-def apply_summer(image):
+def summer_curves(image):
     increaseLookupTable = LookupTable([0, 64, 128, 256], [0, 80, 160, 256])
     decreaseLookupTable = LookupTable([0, 64, 128, 256], [0, 50, 100, 256])
     blue_channel, green_channel,red_channel  = cv2.split(image)
@@ -120,7 +216,7 @@ def apply_summer(image):
     sum= cv2.merge((blue_channel, green_channel, red_channel ))
     return sum
 
-def apply_winter(image):
+def winter_curves(image):
     increaseLookupTable = LookupTable([0, 64, 128, 256], [0, 80, 160, 256])
     decreaseLookupTable = LookupTable([0, 64, 128, 256], [0, 50, 100, 256])
     blue_channel, green_channel,red_channel = cv2.split(image)
@@ -129,159 +225,49 @@ def apply_winter(image):
     win= cv2.merge((blue_channel, green_channel, red_channel))
     return win
 
+def apply_summer(image, out=None):
+    # The spline curves are compiled into one 3-channel table on first use
+    return apply_lut(image, compile_lut("Summer", summer_curves), out)
+
+def apply_winter(image, out=None):
+    return apply_lut(image, compile_lut("Winter", winter_curves), out)
 
-def apply_filter(img, filter_type):
+# List of filters, in the order the grid shows them
+FILTERS = ["Original", "Sepia", "Invert", "Sketch", "HSVFilter",
+           "Color OverLay", "Blur", "Portrait Mode", "Gray Scale", "Bright",
+           "Sharpen", "Pencil Sketch", "HDR", "Summer", "Winter"]
+
+def apply_filter(img, filter_type, out=None, tier="exact"):
     if filter_type == "Sepia":
-        return apply_sepia(img)
+        return apply_sepia(img, out=out)
     elif filter_type == "Invert":
-        return apply_invert(img)
+        return apply_invert(img, out=out)
     elif filter_type == "Sketch":
-        return apply_sketch(img.copy())
+        return apply_sketch(img, out=out)
     elif filter_type == "HSVFilter":
-        return apply_HSVFilter(img.copy())
+        return apply_HSVFilter(img, out=out)
     elif filter_type == "Color OverLay":
-        return apply_color_overlay(img.copy())
+        return apply_color_overlay(img, out=out)
     elif filter_type == "Blur":
-        return apply_blur(img)
+        return apply_blur(img, out=out)
     elif filter_type == "Portrait Mode":
-        return apply_portrait_mode(img)
+        return apply_portrait_mode(img, out=out)
     elif filter_type == "Gray Scale":
-        return apply_greyscale(img)
+        return apply_greyscale(img, out=out)
     elif filter_type == "Bright":
-        return apply_brightness(img)
+        return apply_brightness(img, out=out)
     elif filter_type == "Sharpen":
-        return apply_sharpen(img)
+        return apply_sharpen(img, out=out)
     elif filter_type == "Pencil Sketch":
-        return apply_pencil_sketch(img)
+        return apply_pencil_sketch(img, out=out, tier=tier)
     elif filter_type == "HDR":
-        return apply_HDR(img)
+        return apply_HDR(img, out=out, tier=tier)
     elif filter_type == "Summer":
-        return apply_summer(img)
+        return apply_summer(img, out=out)
     elif filter_type == "Winter":
-        return apply_winter(img)
+        return apply_winter(img, out=out)
+    elif out is not None:
+        np.copyto(out, img)
+        return out
     else:
         return img
-
-class BasicFilterApp(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.init_ui()
-        self.cap = cv2.VideoCapture(0)  # Capture from the default camera
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(30)  # Update every 30 ms
-
-    def init_ui(self):
-        self.setWindowTitle('Basic Filters')
-        self.setGeometry(100, 100, 1000, 700)
-
-        self.grid = QGridLayout()
-        self.setLayout(self.grid)
-
-        # List of filters
-        self.filters = ["Original", "Sepia", "Invert", "Sketch", "HSVFilter", 
-                        "Color OverLay", "Blur", "Portrait Mode", "Gray Scale", "Bright", 
-                        "Sharpen", "Pencil Sketch", "HDR", "Summer", "Winter"]
-
-        # Create labels to display the filters
-        self.labels = []
-        self.selected_filter_index = 0  # Default selected filter is the first one
-
-        for i in range(15):
-            vbox = QVBoxLayout()  # Vertical layout to hold image and text
-            label = QLabel(self)
-            label.setFixedSize(150, 150)
-            label.setStyleSheet("border: 1px solid black;")  # Border for all filters
-            label.mousePressEvent = lambda event, idx=i: self.filter_selected(idx)
-
-            # Text below the filter
-            filter_text = QLabel(self.filters[i], alignment=Qt.AlignCenter)
-            filter_text.setStyleSheet("font-size: 14px; color: white;")
-
-            # Create a widget to hold the layout
-            filter_widget = QWidget(self)
-            filter_layout = QVBoxLayout(filter_widget)
-            filter_layout.addWidget(label)
-            filter_layout.addWidget(filter_text)
-
-            self.labels.append(label)
-            self.grid.addWidget(filter_widget, i // 5, i % 5)  # Add the widget to the grid layout
-
-        # Create a Save Button
-        self.save_button = QPushButton('Save', self)
-        self.save_button.clicked.connect(self.save_filter)
-        self.grid.addWidget(self.save_button, 3, 2, alignment=Qt.AlignCenter)
-
-        # Highlight the original (first) filter with a green box
-        self.update_highlight()
-
-    def update_frame(self):
-        """Capture the frame from the camera and display the selected filter."""
-        ret, frame = self.cap.read()
-        frame = cv2.flip(frame, 1)
-        if ret and frame is not None:
-            # Resize frame to 200x200 for display in each filter
-            frame = cv2.resize(frame, (200, 200))
-            
-            # Apply the selected filter to the frame
-            filtered_frame = apply_filter(frame, self.filters[self.selected_filter_index])
-
-            # Convert to QPixmap for display
-            pixmap = self.convert_cv_qt(filtered_frame)
-
-            # Update all labels with filtered images (same filter for now)
-            for i, label in enumerate(self.labels):
-                filter_frame = apply_filter(frame, self.filters[i])
-                pixmap = self.convert_cv_qt(filter_frame)
-                label.setPixmap(pixmap)
-
-            # Update the highlight
-            self.update_highlight()
-
-    def convert_cv_qt(self, cv_img):
-        """Convert from OpenCV image format to QPixmap"""
-        if cv_img is not None:
-            rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_image.shape
-            bytes_per_line = ch * w
-            convert_to_Qt_format = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            return QPixmap.fromImage(convert_to_Qt_format)
-        return QPixmap()
-
-    def filter_selected(self, index):
-        """Handle filter selection and highlight"""
-        self.selected_filter_index = index
-        self.update_highlight()
-
-    def update_highlight(self):
-        """Update the green highlight on the selected filter"""
-        for i, label in enumerate(self.labels):
-            if i == self.selected_filter_index:
-                label.setStyleSheet("border: 3px solid green;")  # Green border for selected
-            else:
-                label.setStyleSheet("border: 1px solid black;")  # Black border for others
-
-    def save_filter(self):
-        """Save the current frame with the selected filter"""
-        ret, frame = self.cap.read()
-        frame = cv2.flip(frame, 1)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        if ret:
-            selected_filter = apply_filter(frame, self.filters[self.selected_filter_index])
-            filter_name = self.filters[self.selected_filter_index]
-            filename = f"{filter_name}_{timestamp}.png"
-            cv2.imwrite(filename, selected_filter)
-            QMessageBox.information(self, "Image Saved", f"Image saved as {filename}", QMessageBox.Ok)
-            print(f"Filter saved as {filename}")
-
-    def closeEvent(self, event):
-        self.cap.release()
-
-def main():
-    app = QApplication(sys.argv)
-    window = BasicFilterApp()
-    window.show()
-    sys.exit(app.exec_())
-
-if __name__ == '__main__':
-    main()
@@ -0,0 +1,196 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import concurrent.futures
+import cv2
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+# cv2.imwrite parameters for each output format
+FORMATS = {
+    "png": lambda quality: [cv2.IMWRITE_PNG_COMPRESSION, quality if quality is not None else 3],
+    "jpg": lambda quality: [cv2.IMWRITE_JPEG_QUALITY, quality if quality is not None else 95],
+    "webp": lambda quality: [cv2.IMWRITE_WEBP_QUALITY, quality if quality is not None else 90],
+}
+
+
+def find_images(inputs):
+    """Expand directories (recursively) and glob patterns into image paths, each path once."""
+    paths = []
+    seen = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            found = []
+            for root, _, files in os.walk(entry):
+                found.extend(os.path.join(root, name) for name in sorted(files))
+        else:
+            found = sorted(glob.glob(entry, recursive=True))
+        for path in found:
+            key = os.path.realpath(path)
+            if path.lower().endswith(IMAGE_EXTENSIONS) and key not in seen:
+                seen.add(key)
+                paths.append(path)
+    return paths
+
+
+def output_names(paths):
+    """Output name of each path: its path without extension, relative to the inputs' common directory.
+
+    Mirroring the input directories keeps a/IMG_0001.jpg and b/IMG_0001.jpg
+    apart. Paths that still share a name (IMG_0001.jpg and IMG_0001.png
+    side by side) map to None after the first, since their outputs would
+    overwrite each other.
+    """
+    if not paths:
+        return []
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    names = []
+    taken = set()
+    for path in paths:
+        name = os.path.splitext(os.path.relpath(os.path.abspath(path), root))[0]
+        names.append(None if name in taken else name)
+        taken.add(name)
+    return names
+
+
+def _init_worker():
+    # Each process is one lane of work; keep OpenCV from spawning its own threads
+    cv2.setNumThreads(1)
+
+
+_caches = {}  # (directory, max_bytes) -> ResultCache of this worker process
+
+
+def process_image(path, filters, output_dir, fmt, quality, cache_dir=None, cache_bytes=None, name=None):
+    """Filter one image with every requested filter; returns (bytes in, bytes out, cache hits, cache misses).
+
+    Outputs are written as `name`_<filter>.<format> under output_dir
+    (default name: the file name without extension). With `cache_dir`
+    each filtered result is looked up in a resultCache.ResultCache first
+    and stored there when it is computed.
+    """
+    from filterChain import FilterChain
+    from multiFilter import FrameGraph
+    from resultCache import ResultCache, image_digest
+
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Cannot read image {path}")
+    stem = os.path.join(output_dir, name or os.path.splitext(os.path.basename(path))[0])
+    os.makedirs(os.path.dirname(stem), exist_ok=True)
+    params = FORMATS[fmt](quality)
+    graph = FrameGraph(image)  # Shares grayscale/blur work between the filters
+    cache = None
+    if cache_dir:
+        cache = _caches.get((cache_dir, cache_bytes))
+        if cache is None:
+            cache = _caches[(cache_dir, cache_bytes)] = ResultCache(cache_dir, cache_bytes)
+        before = cache.stats()
+        digest = image_digest(image)  # Hashed once for all the filters
+    bytes_out = 0
+    for spec in filters:
+        # "Sepia+Cairo" runs the filters as one fused chain
+        if "+" in spec:
+            compute = lambda spec=spec: FilterChain(spec.split("+")).apply(image)
+        else:
+            compute = lambda spec=spec: graph.output(spec)
+        filtered = cache.apply(image, spec.split("+"), compute, digest=digest) if cache else compute()
+        filename = f"{stem}_{spec}.{fmt}"
+        if not cv2.imwrite(filename, filtered, params):
+            raise ValueError(f"Cannot write {filename}")
+        bytes_out += os.path.getsize(filename)
+    if cache is None:
+        return os.path.getsize(path), bytes_out, 0, 0
+    after = cache.stats()
+    return os.path.getsize(path), bytes_out, after["hits"] - before["hits"], after["misses"] - before["misses"]
+
+
+def run_batch(paths, filters, output_dir, fmt="png", quality=None, workers=None, max_in_flight=None,
+              cache_dir=None, cache_bytes=1024 * 2 ** 20):
+    """Run the filters over all paths on a process pool; returns a stats dict.
+
+    With `cache_dir` the workers share an on-disk result cache of at most
+    `cache_bytes` (see resultCache.ResultCache).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    stats = {"images": 0, "failed": 0, "bytes_in": 0, "bytes_out": 0, "cache_hits": 0, "cache_misses": 0}
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = {}
+        todo = zip(paths, output_names(paths))
+        while True:
+            # Keep at most max_in_flight images submitted at any time
+            while len(pending) < max_in_flight:
+                path, name = next(todo, (None, None))
+                if path is None:
+                    break
+                if name is None:
+                    stats["failed"] += 1
+                    print(f"Skipped {path}: its outputs would overwrite those of an image with the same name",
+                          file=sys.stderr)
+                    continue
+                pending[pool.submit(process_image, path, filters, output_dir, fmt, quality,
+                                    cache_dir, cache_bytes, name)] = path
+            if not pending:
+                break
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    bytes_in, bytes_out, hits, misses = future.result()
+                except Exception as error:
+                    stats["failed"] += 1
+                    print(f"Failed {path}: {error}", file=sys.stderr)
+                    continue
+                stats["images"] += 1
+                stats["bytes_in"] += bytes_in
+                stats["bytes_out"] += bytes_out
+                stats["cache_hits"] += hits
+                stats["cache_misses"] += misses
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def main(argv=None):
+    from filterChain import parse_chain
+
+    parser = argparse.ArgumentParser(description="Apply photo filters to stored images without a window or camera.")
+    parser.add_argument("inputs", nargs="+", help="image directories or glob patterns")
+    parser.add_argument("-f", "--filter", dest="filters", type=parse_chain, action="append", required=True,
+                        help='filter name from any module, e.g. "Sepia" or "Vivid Warm"; '
+                             'join names with "+" to chain them; repeat for several outputs')
+    parser.add_argument("-o", "--output-dir", default="filtered")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="png")
+    parser.add_argument("--quality", type=int,
+                        help="JPEG/WebP quality (0-100) or PNG compression level (0-9)")
+    parser.add_argument("-j", "--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int, help="images queued at once (default: 4 per worker)")
+    parser.add_argument("--cache", help="directory of a result cache shared with earlier and later runs")
+    parser.add_argument("--cache-mb", type=float, default=1024, help="size limit of the result cache (default 1024)")
+    args = parser.parse_args(argv)
+
+    paths = find_images(args.inputs)
+    if not paths:
+        parser.error("no images found")
+
+    filters = ["+".join(names) for names in args.filters]
+    stats = run_batch(paths, filters, args.output_dir, args.format, args.quality,
+                      args.workers, args.max_in_flight, args.cache, int(args.cache_mb * 2 ** 20))
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"Processed {stats['images']} images ({stats['failed']} failed) in {seconds:.2f} s")
+    print(f"Throughput: {stats['images'] / seconds:.1f} images/s, "
+          f"{stats['bytes_in'] / seconds / 1e6:.2f} MB/s read, "
+          f"{stats['bytes_out'] / seconds / 1e6:.2f} MB/s written")
+    if args.cache:
+        lookups = stats["cache_hits"] + stats["cache_misses"]
+        print(f"Result cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses "
+              f"({stats['cache_hits'] / max(lookups, 1):.0%} hit rate)")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
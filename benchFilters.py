@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import threading
+import tracemalloc
+import cv2
+import numpy as np
+
+import filterEngine
+import multiFilter
+from dirtyRegions import IncrementalOutputs
+from filterChain import FILTER_MODULES, filter_names
+
+RESOLUTIONS = {
+    "200x200": (200, 200),
+    "640x480": (640, 480),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+IMAGES = ("synthetic", "sample")
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample.jpg")
+# Scratch growth over the second half of scratch_growth() that counts as a leak;
+# a fixed set of crop shapes still turns up a rare one now and then
+SCRATCH_GROWTH = 0.25
+
+
+def filter_cases(names=None):
+    """(module name, filter name, function) for every filter of every module.
+
+    Each case calls the module's own apply_filter, so every branch of the
+    basic and Instagram filters and every iphoneFilters.apply_* look is
+    covered, "Original" included.
+    """
+    cases = []
+    for module in FILTER_MODULES:
+        for name in module.FILTERS:
+            if names and name not in names:
+                continue
+            cases.append((module.__name__, name, lambda img, apply=module.apply_filter, name=name: apply(img, name)))
+    return cases
+
+
+def tier_cases(names=None):
+    """(module name, filter name, tier, function) for every tier below "exact"."""
+    cases = []
+    for module in FILTER_MODULES:
+        for name in getattr(module, "TIERED_FILTERS", ()):
+            if names and name not in names:
+                continue
+            for tier in module.TIERS[1:]:
+                cases.append((module.__name__, name, tier,
+                              lambda img, apply=module.apply_filter, name=name, tier=tier: apply(img, name, tier=tier)))
+    return cases
+
+
+def tier_error(exact, approx):
+    """How far a tier's output is from the exact one: PSNR and absolute pixel errors."""
+    diff = cv2.absdiff(exact, approx)
+    mse = float(np.mean(diff.astype(np.float64) ** 2))
+    return {
+        "psnr_db": 10 * np.log10(255 ** 2 / mse) if mse else float("inf"),
+        "mean_abs_error": float(np.mean(diff)),
+        "max_abs_error": int(diff.max()),
+    }
+
+
+def make_image(kind, size):
+    """A BGR test image of size=(width, height): seeded noise over gradients, or sample.jpg."""
+    width, height = size
+    if kind == "sample":
+        image = cv2.imread(SAMPLE_PATH)
+        if image is None:
+            raise ValueError(f"Cannot read {SAMPLE_PATH}")
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    # Gradients give the edge and blur filters some structure; the noise keeps LUTs honest
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.dstack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                      (x + y) / 2])
+    noise = rng.normal(0, 20, (height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def bench_case(func, image, repeats=10, max_seconds=2.0):
+    """Time func(image); returns latency percentiles, throughput and peak memory."""
+    func(image)  # Warm-up: compiles LUTs and fills caches, as the apps do on their first frame
+    times = []
+    deadline = time.perf_counter() + max_seconds
+    # At least three runs, then stop at `repeats` or when the time budget is spent
+    while len(times) < repeats and (len(times) < 3 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        func(image)
+        times.append(time.perf_counter() - start)
+
+    # Peak of NumPy/Python allocations in one more run; OpenCV's internal
+    # temporaries are not visible to tracemalloc
+    tracemalloc.start()
+    func(image)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ms = np.array(times) * 1000
+    megapixels = image.shape[0] * image.shape[1] / 1e6
+    mean_s = float(np.mean(times))
+    return {
+        "runs": len(times),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(np.mean(ms)),
+        "fps": 1.0 / mean_s if mean_s > 0 else float("inf"),
+        "megapixels_per_s": megapixels / mean_s if mean_s > 0 else float("inf"),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def run_suite(names=None, resolutions=None, images=IMAGES, repeats=10, max_seconds=2.0, progress=None):
+    """Benchmark every (filter, resolution, image) case; returns the results dict.
+
+    Filters with quality tiers get a case per tier, keyed
+    "module:name[tier]@resolution/image", with its speedup over the exact
+    tier and its error against the exact output (see tier_error).
+    """
+    results = {}
+    for resolution in resolutions or RESOLUTIONS:
+        for kind in images:
+            image = make_image(kind, RESOLUTIONS[resolution])
+            exact = {}
+            for module, name, func in filter_cases(names):
+                key = f"{module}:{name}@{resolution}/{kind}"
+                results[key] = bench_case(func, image, repeats, max_seconds)
+                exact[(module, name)] = (func, results[key])
+                if progress:
+                    progress(key, results[key])
+            for module, name, tier, func in tier_cases(names):
+                reference, reference_result = exact[(module, name)]
+                key = f"{module}:{name}[{tier}]@{resolution}/{kind}"
+                result = results[key] = bench_case(func, image, repeats, max_seconds)
+                result["speedup"] = reference_result["p50_ms"] / result["p50_ms"] if result["p50_ms"] else float("inf")
+                result.update(tier_error(reference(image).copy(), func(image)))
+                if progress:
+                    progress(key, result)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "threads": cv2.getNumThreads(),
+        },
+        "results": results,
+    }
+
+
+def scratch_growth(names=None, size=(200, 200), frames=300, image="sample"):
+    """Scratch memory of one thread filtering `frames` frames of random motion incrementally.
+
+    Rectangles of random sizes and places are drawn on every frame, so the
+    changed regions differ each time as they would in front of a camera.
+    Returns the thread's scratch pool stats (filterEngine.BufferPool.stats)
+    after half and after all of the frames, keyed by frame count. A pool
+    that grows by more than SCRATCH_GROWTH in the second half keeps a
+    buffer per shape of motion.
+    """
+    base = make_image(image, size)
+    names = [name for name in filter_names() if not names or name in names]
+    rng = np.random.default_rng(0)
+    stats = {}
+
+    def run():
+        incremental = IncrementalOutputs()
+        width, height = size
+        for index in range(frames):
+            frame = base.copy()
+            for _ in range(rng.integers(1, 4)):
+                w, h = int(rng.integers(4, width // 2)), int(rng.integers(4, height // 2))
+                x, y = int(rng.integers(0, width - w)), int(rng.integers(0, height - h))
+                cv2.rectangle(frame, (x, y), (x + w, y + h), tuple(int(c) for c in rng.integers(0, 256, 3)), -1)
+            graph = multiFilter.FrameGraph(frame, tier="fast")
+            for name in names:
+                incremental.output(graph, name)
+            if index + 1 in (frames // 2, frames):
+                stats[index + 1] = filterEngine.scratch_pool().stats()
+
+    # A thread of its own, so the pool holds nothing but this run's buffers
+    thread = threading.Thread(target=run, name="scratch-growth")
+    thread.start()
+    thread.join()
+    return stats
+
+
+def compare(results, baseline, threshold=0.2, min_delta_ms=0.1):
+    """Cases whose median latency grew by more than `threshold` over the baseline.
+
+    Differences under `min_delta_ms` are ignored as timer noise. Returns a
+    list of (key, baseline p50, new p50) tuples.
+    """
+    regressions = []
+    for key, result in results["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        before, after = old["p50_ms"], result["p50_ms"]
+        if after > before * (1 + threshold) and after - before > min_delta_ms:
+            regressions.append((key, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every filter at several resolutions, without a window or camera.")
+    parser.add_argument("-f", "--filter", dest="filters", action="append",
+                        help="only benchmark this filter (repeatable; default: all)")
+    parser.add_argument("-r", "--resolution", dest="resolutions", action="append", choices=list(RESOLUTIONS),
+                        help="only benchmark this resolution (repeatable; default: all)")
+    parser.add_argument("--image", dest="images", action="append", choices=IMAGES,
+                        help="only benchmark on this image (repeatable; default: both)")
+    parser.add_argument("--repeats", type=int, default=10, help="timed runs per case")
+    parser.add_argument("--max-seconds", type=float, default=2.0,
+                        help="time budget per case; slow cases stop early after three runs")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="JSON file for the results")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fail when a median latency grows by more than this fraction (default 0.2)")
+    parser.add_argument("--threads", type=int, help="OpenCV threads (default: OpenCV's choice)")
+    parser.add_argument("--scratch-frames", type=int, default=0,
+                        help="also filter this many frames of random motion incrementally (e.g. 600) and fail "
+                             "when scratch memory keeps growing")
+    args = parser.parse_args(argv)
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    def progress(key, result):
+        line = (f"{key:<50} p50 {result['p50_ms']:9.2f} ms  p99 {result['p99_ms']:9.2f} ms  "
+                f"{result['megapixels_per_s']:8.1f} MP/s  peak {result['peak_mb']:7.1f} MB")
+        if "speedup" in result:
+            line += (f"  {result['speedup']:.1f}x faster, PSNR {result['psnr_db']:.1f} dB, "
+                     f"mean error {result['mean_abs_error']:.2f}")
+        print(line)
+
+    results = run_suite(args.filters, args.resolutions, args.images or IMAGES, args.repeats, args.max_seconds, progress)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    status = 0
+    if args.scratch_frames:
+        resolution = (args.resolutions or ["200x200"])[0]
+        stats = scratch_growth(args.filters, RESOLUTIONS[resolution], args.scratch_frames)
+        for frames, pool in sorted(stats.items()):
+            print(f"Scratch after {frames} frames at {resolution}: {pool['bytes'] / 2 ** 20:.1f} MB "
+                  f"in {pool['buffers']} buffers")
+        half, end = (pool["bytes"] for _, pool in sorted(stats.items()))
+        if end > half * (1 + SCRATCH_GROWTH):
+            print(f"SCRATCH GROWTH: scratch memory grew by more than {SCRATCH_GROWTH:.0%} over the second half")
+            status = 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: {before:.2f} ms -> {after:.2f} ms (+{(after / before - 1) * 100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions over {args.threshold:.0%} against {args.baseline}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import time
+import queue
+import threading
+import collections
+import cv2
+
+
+class CameraCapture:
+    """Reads a cv2.VideoCapture on its own thread into a small ring buffer.
+
+    read() mirrors cv2.VideoCapture.read() but never blocks: it hands out
+    the newest frame and drops any older frame the UI did not get to.
+    Frames that fall out of the buffer unread are counted in `dropped`.
+
+    Frames are decoded into a fixed set of reused arrays, so a frame handed
+    out is overwritten a few captures later: copy it (flip, resize, ...)
+    before keeping it.
+
+    record() additionally hands copies of the next N frames to a queue,
+    without dropping any, for burst capture.
+    """
+
+    def __init__(self, source=0, buffer_size=2):
+        self.cap = cv2.VideoCapture(source)
+        self.frames = collections.deque(maxlen=buffer_size)  # (sequence number, frame, capture time)
+        # One slot more than the ring holds: the slot being written is never in the ring
+        self.slots = [None] * (buffer_size + 1)
+        self.captured = 0
+        self.dropped = 0
+        self.last_read = 0
+        self.captured_at = None  # time.perf_counter() when the frame last read was captured
+        self.recorders = []  # [queue, frames still to record]
+        self.lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, name="CameraCapture", daemon=True)
+        self.thread.start()
+
+    def _capture_loop(self):
+        while self.running:
+            index = (self.captured + 1) % len(self.slots)
+            ret, frame = self.cap.read(self.slots[index])
+            if not ret:
+                # Camera not ready or unplugged; don't spin on it
+                time.sleep(0.01)
+                continue
+            self.slots[index] = frame
+            captured_at = time.perf_counter()
+            with self.lock:
+                self.captured += 1
+                self.frames.append((self.captured, frame, captured_at))
+                recorders = self.recorders
+                if recorders:
+                    for recorder in recorders:
+                        recorder[1] -= 1
+                    self.recorders = [recorder for recorder in recorders if recorder[1] > 0]
+            for recorder, _ in recorders:
+                recorder.put(frame.copy())
+
+    def read(self):
+        """Take the newest frame not returned before, as (ret, frame)."""
+        with self.lock:
+            if not self.frames or self.frames[-1][0] == self.last_read:
+                return False, None
+            sequence, frame, captured_at = self.frames[-1]
+            self.dropped += sequence - self.last_read - 1
+            self.last_read = sequence
+            self.captured_at = captured_at
+            return True, frame
+
+    def record(self, count):
+        """Queue that receives copies of the next `count` captured frames."""
+        recorder = queue.Queue()
+        with self.lock:
+            self.recorders.append([recorder, count])
+        return recorder
+
+    def latest(self):
+        """Peek at the newest frame without consuming it, e.g. for saving."""
+        with self.lock:
+            if not self.frames:
+                return False, None
+            return True, self.frames[-1][1]
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.running = False
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.cap.release()
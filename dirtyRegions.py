@@ -0,0 +1,134 @@
+import os
+import math
+import threading
+import cv2
+import numpy as np
+
+
+class IncrementalFilter:
+    """One filter's output for a video, re-filtered only where the frame changed.
+
+    apply(graph) compares graph.frame (see multiFilter.FrameGraph) with the
+    input the cached output was made from, on a grid of `tile`-pixel tiles.
+    A tile is dirty when more than `min_changed` of its pixels differ by
+    more than `noise_threshold`. Dirty tiles and the tiles within the
+    filter's halo of them (tiledFilters.HALOS) are filtered again from a
+    crop of the frame that includes the halo; the rest of the output is
+    reused, and an unchanged frame is not filtered at all. When more than
+    `full_above` of the tiles are affected the whole frame is filtered.
+    Crops are grown to a power of two tiles plus the halo each way (see
+    _span), so the filters' scratch buffers (filterEngine.scratch) come in a
+    few shapes per frame size instead of one per motion.
+
+    Changes below the noise threshold are compared against the last input
+    each tile was filtered from, so slow drift still refreshes it. The
+    returned output is read-only; `reuse` is the fraction of the last one
+    that was reused.
+    """
+
+    def __init__(self, filter_name, tile=32, noise_threshold=12, min_changed=0.01, full_above=0.5):
+        import tiledFilters  # It imports the filter modules, which import this one
+        self.filter_name = filter_name
+        self.halo = tiledFilters.HALOS.get(filter_name, 0)
+        self.tile = tile
+        self.noise_threshold = noise_threshold
+        self.min_changed = min_changed
+        self.full_above = full_above
+        self.lock = threading.Lock()
+        self.reference = None
+        self.output = None
+        self.reuse = 0.0
+
+    def _dirty_tiles(self, frame):
+        diff = cv2.absdiff(frame, self.reference)
+        if diff.ndim == 3:
+            diff = diff.max(axis=2)
+        _, changed = cv2.threshold(diff, self.noise_threshold, 1, cv2.THRESH_BINARY)
+        # Pad to whole tiles and count the changed pixels of each one
+        h, w = changed.shape
+        rows, cols = math.ceil(h / self.tile), math.ceil(w / self.tile)
+        changed = cv2.copyMakeBorder(changed, 0, rows * self.tile - h, 0, cols * self.tile - w, cv2.BORDER_CONSTANT, 0)
+        counts = changed.reshape(rows, self.tile, cols, self.tile).sum(axis=(1, 3))
+        return (counts > self.min_changed * self.tile * self.tile).astype(np.uint8)
+
+    def _span(self, start, stop, size):
+        # Bounds of a crop covering [start, stop) with the halo on both sides,
+        # sized to a power of two tiles plus the halos and kept in the frame
+        tiles = 1 << max(0, math.ceil(math.log2(math.ceil((stop - start) / self.tile))))
+        length = min(size, tiles * self.tile + 2 * self.halo)
+        first = min(max(start - self.halo, 0), size - length)
+        return first, first + length
+
+    def _full(self, graph):
+        self.output = np.array(graph.output(self.filter_name))  # Graph outputs may be overwritten next frame
+        self.reference = graph.frame.copy()
+        self.reuse = 0.0
+        return self.output
+
+    def apply(self, graph):
+        frame = graph.frame
+        with self.lock:
+            if self.output is None or frame.shape != self.reference.shape:
+                return self._full(graph)
+            dirty = self._dirty_tiles(frame)
+            if not dirty.any():
+                self.reuse = 1.0
+                return self.output
+            reach = math.ceil(self.halo / self.tile)
+            affected = cv2.dilate(dirty, np.ones((2 * reach + 1, 2 * reach + 1), np.uint8)) if reach else dirty
+            if affected.mean() > self.full_above:
+                return self._full(graph)
+
+            # Filter each connected group of affected tiles as one crop; the
+            # previous output may still be on screen, so patch a copy
+            output = self.output.copy()
+            h, w = frame.shape[:2]
+            t = self.tile
+            recomputed = 0
+            _, _, stats, _ = cv2.connectedComponentsWithStats(affected, connectivity=8)
+            for x, y, width, height, _ in stats[1:]:
+                top, left = y * t, x * t
+                bottom, right = min((y + height) * t, h), min((x + width) * t, w)
+                y0, y1 = self._span(top, bottom, h)
+                x0, x1 = self._span(left, right, w)
+                result = graph.crop(y0, y1, x0, x1).output(self.filter_name)
+                output[top:bottom, left:right] = result[top - y0:bottom - y0, left - x0:right - x0]
+                recomputed += int((bottom - top) * (right - left))
+
+            # The dirty tiles are now up to date with this frame
+            mask = cv2.resize(dirty, (dirty.shape[1] * t, dirty.shape[0] * t), interpolation=cv2.INTER_NEAREST)[:h, :w]
+            np.copyto(self.reference, frame, where=mask.astype(bool).reshape(mask.shape + (1,) * (frame.ndim - 2)))
+            self.output = output
+            self.reuse = max(0.0, 1.0 - recomputed / (h * w))
+            return output
+
+
+class IncrementalOutputs:
+    """An IncrementalFilter per filter an app shows, created on first use.
+
+    With enabled=False output() simply returns graph.output(name).
+    """
+
+    def __init__(self, enabled=True, **options):
+        self.enabled = enabled
+        self.options = options
+        self.filters = {}
+
+    @classmethod
+    def from_env(cls, **options):
+        """Incremental unless FILTER_INCREMENTAL=0."""
+        return cls(os.environ.get("FILTER_INCREMENTAL", "1") != "0", **options)
+
+    def output(self, graph, filter_name):
+        if not self.enabled:
+            return graph.output(filter_name)
+        incremental = self.filters.get(filter_name)
+        if incremental is None:
+            incremental = self.filters.setdefault(filter_name, IncrementalFilter(filter_name, **self.options))
+        return incremental.apply(graph)
+
+    def reuse_ratio(self):
+        """Mean fraction of each filter's last output that was reused."""
+        if not self.filters:
+            return 0.0
+        return sum(incremental.reuse for incremental in self.filters.values()) / len(self.filters)
@@ -0,0 +1,101 @@
+import collections
+
+import filterChain  # Imports the filter modules, and iphoneFilters imports this one
+
+
+class EditStack:
+    """Non-destructive edits: an ordered list of filter stages over a source image.
+
+    The image after each stage is cached under the stages that produced it,
+    so changing, inserting, removing or reordering stage k only recomputes
+    stage k and the ones after it: the outputs before k are still cached,
+    and going back to an earlier arrangement finds its outputs again.
+
+    Cached outputs are capped at `max_bytes` in total and evicted least
+    recently used first; an evicted output is recomputed from the nearest
+    cached stage before it when it is needed again. The source itself is
+    never evicted. Outputs are shared with the cache and read-only.
+    """
+
+    def __init__(self, source=None, max_bytes=64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.source = None
+        self.stages = []
+        self.cache = collections.OrderedDict()  # tuple of stage names -> output
+        self.bytes = 0
+        self.chains = {}  # One FilterChain per filter name, planned once
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if source is not None:
+            self.set_source(source)
+
+    def set_source(self, image):
+        """Start over on a new image; the stages are kept."""
+        self.source = image
+        self.cache.clear()
+        self.bytes = 0
+
+    def set_stages(self, names):
+        self.stages = list(names)
+
+    def append(self, name):
+        self.stages.append(name)
+
+    def insert(self, index, name):
+        self.stages.insert(index, name)
+
+    def replace(self, index, name):
+        self.stages[index] = name
+
+    def remove(self, index):
+        del self.stages[index]
+
+    def move(self, source, destination):
+        self.stages.insert(destination, self.stages.pop(source))
+
+    def output(self, count=None):
+        """The source after its first `count` stages (default: all of them)."""
+        stages = tuple(self.stages[:len(self.stages) if count is None else count])
+        # Start from the longest prefix of the stages that is still cached
+        start, image = 0, self.source
+        for end in range(len(stages), 0, -1):
+            cached = self.cache.get(stages[:end])
+            if cached is not None:
+                self.cache.move_to_end(stages[:end])
+                self.hits += 1
+                start, image = end, cached
+                break
+        for end in range(start + 1, len(stages) + 1):
+            self.misses += 1
+            image = self._chain(stages[end - 1]).apply(image)
+            if image is self.source or any(image is value for value in self.cache.values()):
+                image = image.copy()  # "Original" hands its input back unchanged
+            self._store(stages[:end], image)
+        return image
+
+    def _chain(self, name):
+        chain = self.chains.get(name)
+        if chain is None:
+            chain = self.chains[name] = filterChain.FilterChain([name])
+        return chain
+
+    def _store(self, key, image):
+        if image.nbytes > self.max_bytes:
+            return  # Larger than the whole cache: recomputed every time
+        self.cache[key] = image
+        self.bytes += image.nbytes
+        while self.bytes > self.max_bytes:
+            _, evicted = self.cache.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "stages": len(self.stages),
+            "cached": len(self.cache),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,113 @@
+import queue
+import threading
+import cv2
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from batchFilters import FORMATS
+
+BURST_FRAMES = 10  # Frames saved by one press of a Burst button
+
+
+class ExportQueue(QObject):
+    """Filters and encodes saved frames on background writer threads.
+
+    submit() copies the frame and returns at once; the writers take jobs
+    from a bounded queue, run the (full-resolution) filter and write the
+    file. Every finished job is published through
+    `exported(filename, error)`, which Qt delivers on the GUI thread, with
+    error None on success.
+    """
+
+    exported = pyqtSignal(str, object)
+
+    def __init__(self, fmt="png", quality=None, workers=2, max_pending=8):
+        super().__init__()
+        self.fmt = fmt
+        self.quality = quality
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.closed = False
+        self.feeders = []  # Burst threads still handing recorded frames to the queue
+        self.threads = [threading.Thread(target=self._write_loop, name=f"ExportQueue-{i}", daemon=True)
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def _job(self, frame, render, stem, fmt, quality):
+        fmt = fmt or self.fmt
+        params = FORMATS[fmt](quality if quality is not None else self.quality)
+        return frame, render, f"{stem}.{fmt}", params
+
+    def submit(self, frame, render, stem, fmt=None, quality=None):
+        """Queue `render(frame)` to be written as `stem`.<format>.
+
+        Returns the file name, or None when the queue is full; the caller
+        never waits for the encoder.
+        """
+        job = self._job(frame.copy(), render, stem, fmt, quality)
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            return None
+        return job[2]
+
+    def burst(self, capture, count, render, stem, fmt=None, quality=None):
+        """Export the next `count` camera frames as `stem`_000, `stem`_001, ...
+
+        The frames are recorded by the capture thread, so none are dropped
+        however long the writers take; they wait in memory for a free slot
+        in the queue. shutdown() waits for them too.
+        """
+        if self.closed:
+            return
+        recorder = capture.record(count)
+
+        def feed():
+            for index in range(count):
+                try:
+                    frame = recorder.get(timeout=1.0)
+                except queue.Empty:
+                    break  # The camera stopped delivering frames
+                self.jobs.put(self._job(frame, render, f"{stem}_{index:03d}", fmt, quality))
+
+        self.feeders = [thread for thread in self.feeders if thread.is_alive()]
+        self.feeders.append(threading.Thread(target=feed, name="ExportQueue-burst", daemon=True))
+        self.feeders[-1].start()
+
+    def _write_loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            frame, render, filename, params = job
+            error = None
+            try:
+                image = render(frame) if render is not None else frame
+                if not cv2.imwrite(filename, image, params):
+                    raise ValueError(f"Cannot write {filename}")
+            except Exception as exc:
+                error = exc
+            self.exported.emit(filename, error)
+
+    def pending(self):
+        return self.jobs.qsize()
+
+    def shutdown(self, wait=True):
+        """Stop the writers once the queued jobs and the frames of running bursts are written.
+
+        With wait False this returns at once and the writers finish in the
+        background.
+        """
+        self.closed = True
+        if wait:
+            self._close()
+        else:
+            threading.Thread(target=self._close, name="ExportQueue-close", daemon=True).start()
+
+    def _close(self):
+        # Bursts first, so none of their frames land behind the sentinels
+        for thread in self.feeders:
+            thread.join()
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
@@ -0,0 +1,271 @@
+import argparse
+import cv2
+import numpy as np
+
+import basicFilters
+import instaFilters
+import iphoneFilters
+from filterEngine import compile_lut, scale_abs_lut, apply_lut
+
+# Every filter module exposes FILTERS and apply_filter(img, name)
+FILTER_MODULES = (basicFilters, instaFilters, iphoneFilters)
+
+# BT.601 weights used by cv2.COLOR_BGR2GRAY, as a 1x3 matrix over BGR
+GRAY_MATRIX = np.array([[0.114, 0.587, 0.299]])
+GRAY_TO_BGR = np.ones((3, 1))
+BGRA_TO_BGR = np.hstack([np.eye(3), np.zeros((3, 1))])
+
+
+def filter_names():
+    """All filter names of the three modules, without duplicates."""
+    names = []
+    for module in FILTER_MODULES:
+        for name in module.FILTERS:
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def parse_chain(spec):
+    """Filter names of a "+"-joined spec such as "Sepia+Cairo", each checked.
+
+    Raises argparse.ArgumentTypeError for an unknown name, so it also
+    serves as an argparse type=.
+    """
+    names = spec.split("+")
+    known = filter_names()
+    for name in names:
+        if name not in known:
+            raise argparse.ArgumentTypeError(f"unknown filter {name!r}; choose from: {', '.join(known)}")
+    return names
+
+
+def get_filter(name):
+    """Return a callable (image, out=None) -> image for any filter of the three modules."""
+    for module in FILTER_MODULES:
+        if name in module.FILTERS:
+            return lambda img, out=None, apply=module.apply_filter: apply(img, name, out=out)
+    raise KeyError(f"Unknown filter: {name}")
+
+
+class LutOp:
+    """Pointwise op: a 256-entry table with one column per channel (or one shared)."""
+
+    kind = "lut"
+
+    def __init__(self, name, lut):
+        self.name = name
+        self.table = lut.reshape(256, -1)
+
+    @property
+    def channels_in(self):
+        return 3 if self.table.shape[1] == 3 else None
+
+
+class MatrixOp:
+    """Linear colour op: cv2.transform with an (out x in) matrix."""
+
+    kind = "matrix"
+
+    def __init__(self, name, matrix, exact=None):
+        self.name = name
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        # Bit-exact implementation used when the op ends up alone in its pass
+        self.exact = exact
+
+    @property
+    def channels_in(self):
+        return self.matrix.shape[1]
+
+
+class BarrierOp:
+    """Spatial or otherwise non-fusable op, run as its own pass on BGR input."""
+
+    kind = "barrier"
+    channels_in = 3
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+
+
+def _gray(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def ops_for(name):
+    """Decompose a filter into the ops the chain knows how to fuse."""
+    if name == "Original":
+        return []
+    if name == "Sepia":
+        return [MatrixOp(name, basicFilters.SEPIA_MATRIX, basicFilters.apply_sepia)]
+    if name in ("Gray Scale", "Mono"):
+        return [MatrixOp(name, GRAY_MATRIX, _gray)]
+    if name == "Invert":
+        return [LutOp(name, compile_lut("Invert", cv2.bitwise_not, channels=1))]
+    if name == "Bright":
+        return [LutOp(name, scale_abs_lut(1.0, 60))]
+    if name == "Summer":
+        return [LutOp(name, compile_lut("Summer", basicFilters.summer_curves))]
+    if name == "Winter":
+        return [LutOp(name, compile_lut("Winter", basicFilters.winter_curves))]
+    if name == "Tokyo":
+        return [LutOp(name, compile_lut("Tokyo", instaFilters.tokyo_fade, channels=1)),
+                MatrixOp(name, GRAY_MATRIX, _gray)]
+    if name in instaFilters.SCALE_ABS_LOOKS:
+        return [LutOp(name, scale_abs_lut(*instaFilters.SCALE_ABS_LOOKS[name]))]
+    if name in ("Vivid", "Vivid Warm", "Vivid Cool", "Dramatic", "Dramatic Warm", "Dramatic Cool"):
+        curve = getattr(iphoneFilters, name.lower().replace(" ", "_") + "_curve")
+        return [LutOp(name, compile_lut(name, curve))]
+    if name == "Silvertone":
+        return [MatrixOp(name, GRAY_MATRIX, _gray),
+                LutOp(name, compile_lut(name, iphoneFilters.silvertone_curve, channels=1))]
+    if name == "Noir":
+        return [MatrixOp(name, GRAY_MATRIX, _gray),
+                LutOp(name, compile_lut(name, iphoneFilters.noir_curve, channels=1))]
+    return [BarrierOp(name, get_filter(name))]
+
+
+def _conversion(channels):
+    # Bring a 1- or 4-channel intermediate back to BGR for ops that need it
+    if channels == 1:
+        return MatrixOp("to BGR", GRAY_TO_BGR, lambda img: cv2.cvtColor(img, cv2.COLOR_GRAY2BGR))
+    return MatrixOp("to BGR", BGRA_TO_BGR, lambda img: cv2.cvtColor(img, cv2.COLOR_BGRA2BGR))
+
+
+def _compose_luts(first, second):
+    # Table of "second after first", broadcasting shared tables to 3 channels
+    columns = max(first.shape[1], second.shape[1])
+    out = np.empty((256, columns), dtype=np.uint8)
+    for c in range(columns):
+        out[:, c] = second[:, c % second.shape[1]][first[:, c % first.shape[1]]]
+    return out
+
+
+class FusedStep:
+    """One pass over the pixels, standing for one or more original ops."""
+
+    def __init__(self, ops):
+        self.ops = ops
+        self.kind = ops[0].kind
+        if self.kind == "lut":
+            table = ops[0].table
+            for op in ops[1:]:
+                table = _compose_luts(table, op.table)
+            self.lut = table.reshape(1, 256) if table.shape[1] == 1 else table.reshape(1, 256, 3)
+        elif self.kind == "matrix":
+            matrix = ops[0].matrix
+            for op in ops[1:]:
+                matrix = op.matrix @ matrix
+            self.matrix = matrix
+
+    def run(self, img):
+        if self.kind == "lut":
+            return apply_lut(img, self.lut)
+        if len(self.ops) == 1:
+            op = self.ops[0]
+            return op.func(img) if self.kind == "barrier" else op.exact(img)
+        return cv2.transform(img, self.matrix)
+
+    def describe(self):
+        return f"{self.kind}({' + '.join(op.name for op in self.ops)})"
+
+
+class FilterChain:
+    """A stack of filters from any of the three modules, fused before it runs.
+
+    Consecutive colour matrices collapse into one cv2.transform and
+    consecutive lookup tables into one cv2.LUT; barrier ops (blur, sharpen,
+    detailEnhance, ...) always run on their own. Lookup tables compose
+    exactly; a fused matrix skips the uint8 rounding and saturation between
+    its stages, so bright pixels may differ slightly from running the
+    filters one by one. After apply(), `passes` holds the number of
+    full-frame passes that were actually executed and `unfused_passes`
+    the number the same plan takes without fusion: one per op and per
+    channel conversion.
+    """
+
+    def __init__(self, filter_names):
+        self.filter_names = list(filter_names)
+        self.ops = [op for name in self.filter_names for op in ops_for(name)]
+        # Runs of fusable ops, with every barrier in a segment of its own
+        self.segments = []
+        for op in self.ops:
+            if op.kind == "barrier" or not self.segments or self.segments[-1][0].kind == "barrier":
+                self.segments.append([op])
+            else:
+                self.segments[-1].append(op)
+        self.passes = 0
+        self.unfused_passes = 0
+        self.segment_channels = []  # Input channels of each segment in the last apply()
+        self._plans = {}
+
+    @property
+    def pointwise(self):
+        """True when every op maps each pixel on its own (no blur, edges, ...)."""
+        return all(op.kind != "barrier" for op in self.ops)
+
+    def _plan_segment(self, index, channels):
+        # A barrier's output channel count is only known once it has run, so
+        # each segment is planned (and cached) per input channel count.
+        key = (index, channels)
+        steps = self._plans.get(key)
+        if steps is None:
+            segment = self.segments[index]
+            runs = []
+            for op in segment:
+                if op.channels_in is not None and op.channels_in != channels:
+                    _append(runs, _conversion(channels))
+                    channels = 3
+                _append(runs, op)
+                if op.kind == "matrix":
+                    channels = op.matrix.shape[0]
+                elif op.kind == "lut" and op.table.shape[1] == 3:
+                    channels = 3
+            if segment[0].kind != "barrier" and index + 1 < len(self.segments) and channels != 3:
+                # Hand the next barrier BGR, converting inside the fused pass
+                _append(runs, _conversion(channels))
+            steps = [FusedStep(run) for run in runs]
+            self._plans[key] = steps
+        return steps
+
+    def apply(self, img):
+        self.passes = 0
+        self.unfused_passes = 0
+        self.segment_channels = []
+        for index in range(len(self.segments)):
+            self.segment_channels.append(_channels(img))
+            for step in self._plan_segment(index, _channels(img)):
+                img = step.run(img)
+                self.passes += 1
+                self.unfused_passes += len(step.ops)
+        return img
+
+    def describe(self, channels=3):
+        """Fused steps for an input with the given channel count.
+
+        Barrier outputs are assumed to be BGR, unless the last apply() had
+        an input of this channel count: then the channels it met are used.
+        """
+        seen = self.segment_channels if self.segment_channels[:1] == [channels] else None
+        steps = []
+        for index in range(len(self.segments)):
+            steps.extend(step.describe() for step in self._plan_segment(index, seen[index] if seen else channels))
+            channels = 3
+        return steps
+
+
+def _append(runs, op):
+    if runs and op.kind != "barrier" and runs[-1][-1].kind == op.kind:
+        runs[-1].append(op)
+    else:
+        runs.append([op])
+
+
+def _channels(img):
+    return 1 if img.ndim == 2 else img.shape[2]
+
+
+def apply_chain(img, filter_names):
+    """Apply several filters in order as one fused FilterChain."""
+    return FilterChain(filter_names).apply(img)
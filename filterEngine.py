@@ -0,0 +1,248 @@
+import weakref
+import threading
+import collections
+import cv2
+import numpy as np
+
+# Compiled lookup tables, keyed by filter name (or by the parameters that
+# define the curve). Each table is built once and shared by every frame.
+_lut_cache = {}
+
+
+def compile_lut(key, curve, channels=3):
+    """Compile a per-pixel function into a uint8 lookup table, once per key.
+
+    `curve` is evaluated a single time on a 256-entry ramp, so it may use
+    whatever float math it likes: only the resulting table is kept.
+    """
+    lut = _lut_cache.get(key)
+    if lut is None:
+        ramp = np.arange(256, dtype=np.uint8).reshape(1, 256, 1)
+        if channels == 1:
+            ramp = ramp.reshape(1, 256)
+        else:
+            ramp = np.repeat(ramp, channels, axis=2)
+        lut = np.ascontiguousarray(curve(ramp), dtype=np.uint8).reshape(1, 256, channels)
+        if channels == 1:
+            lut = lut.reshape(1, 256)
+        _lut_cache[key] = lut
+    return lut
+
+
+def scale_abs_lut(alpha, beta):
+    """Lookup table equivalent to cv2.convertScaleAbs(image, alpha, beta)."""
+    return compile_lut(("scale_abs", alpha, beta),
+                       lambda ramp: cv2.convertScaleAbs(ramp, alpha=alpha, beta=beta),
+                       channels=1)
+
+
+def apply_lut(image, lut, out=None):
+    """Run a compiled table over the image in a single cv2.LUT pass."""
+    return cv2.LUT(image, lut, dst=out)
+
+
+# Bytes of buffers a pool keeps by default; scratch() has one pool per thread
+POOL_BYTES = 256 * 2 ** 20
+
+
+class BufferPool:
+    """Reusable arrays keyed by (tag, shape, dtype), within a byte budget.
+
+    get() hands back the same array for the same key every time, so a loop
+    that asks for its buffers each frame stops allocating after the first.
+    When a new buffer takes the total past `max_bytes`, the least recently
+    used buffers are dropped from the pool (their current users keep them),
+    so callers whose shapes keep changing don't grow it without bound.
+    """
+
+    def __init__(self, max_bytes=POOL_BYTES):
+        self.max_bytes = max_bytes
+        self.buffers = collections.OrderedDict()
+        self.bytes = 0
+        self.allocations = 0
+        self.evictions = 0
+
+    def get(self, tag, shape, dtype=np.uint8):
+        key = (tag, tuple(shape), np.dtype(dtype))
+        buffer = self.buffers.get(key)
+        if buffer is not None:
+            self.buffers.move_to_end(key)
+            return buffer
+        buffer = self.buffers[key] = np.empty(shape, dtype=dtype)
+        self.bytes += buffer.nbytes
+        self.allocations += 1
+        while self.bytes > self.max_bytes and len(self.buffers) > 1:
+            _, evicted = self.buffers.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+        return buffer
+
+    def stats(self):
+        return {"buffers": len(self.buffers), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "allocations": self.allocations, "evictions": self.evictions}
+
+
+_local = threading.local()
+_scratch_pools = weakref.WeakSet()  # The scratch pools of the live threads
+
+
+def scratch_pool():
+    """The calling thread's pool of scratch arrays."""
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = _local.pool = BufferPool()
+        _scratch_pools.add(pool)
+    return pool
+
+
+def scratch(tag, shape, dtype=np.uint8):
+    """Per-thread scratch array for an intermediate that never leaves a filter."""
+    return scratch_pool().get(tag, shape, dtype)
+
+
+def scratch_stats():
+    """Buffers and bytes held by the scratch pools of all live threads."""
+    pools = list(_scratch_pools)
+    return {"threads": len(pools), "buffers": sum(len(pool.buffers) for pool in pools),
+            "bytes": sum(pool.bytes for pool in pools), "evictions": sum(pool.evictions for pool in pools)}
+
+
+# Frame-independent data (masks, overlays), built once per resolution
+_constant_cache = {}
+
+
+def cached_constant(key, build):
+    """Return build() for this key, building it only the first time."""
+    value = _constant_cache.get(key)
+    if value is None:
+        value = _constant_cache[key] = build()
+    return value
+
+
+class TemporalCache:
+    """One per-frame intermediate (e.g. a mask), reused across video frames.
+
+    get() recomputes the value when the frame size changes, every
+    `refresh_every` frames, or when the frame has changed by more than
+    `change_threshold` (mean absolute difference of a 32x24 thumbnail,
+    0-255) since the last refresh; otherwise it returns the previous value.
+    With `smoothing` > 0 a refreshed value is blended with the previous
+    one, so a mask does not flicker between refreshes.
+
+    hits, misses and `refreshes` (counts per reason) show how often the
+    cache saved the computation.
+    """
+
+    SIGNATURE_SIZE = (32, 24)
+
+    def __init__(self, refresh_every=10, change_threshold=4.0, smoothing=0.0):
+        self.refresh_every = refresh_every
+        self.change_threshold = change_threshold
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.value = None
+        self.shape = None
+        self.signature = None
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = {"size": 0, "interval": 0, "change": 0}
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _stale(self, frame, signature):
+        if self.value is None or frame.shape != self.shape:
+            return "size"
+        if self.age + 1 >= self.refresh_every:
+            return "interval"
+        if cv2.norm(signature, self.signature, cv2.NORM_L1) / signature.size > self.change_threshold:
+            return "change"
+        return None
+
+    def get(self, frame, compute, out=None):
+        """The cached value for `frame`, or compute(None) when it is stale.
+
+        The value is copied into `out` when given; otherwise it is shared
+        with later frames and must be treated as read-only.
+        """
+        signature = cv2.resize(frame, self.SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+        with self.lock:
+            reason = self._stale(frame, signature)
+            if reason is None:
+                self.hits += 1
+                self.age += 1
+            else:
+                value = np.array(compute(None))  # Own copy, even if compute returns a scratch array
+                if self.smoothing and reason != "size":
+                    value = cv2.addWeighted(value, 1.0 - self.smoothing, self.value, self.smoothing, 0)
+                self.value, self.shape, self.signature, self.age = value, frame.shape, signature, 0
+                self.misses += 1
+                self.refreshes[reason] += 1
+            value = self.value
+        if out is None:
+            return value
+        np.copyto(out, value)
+        return out
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate, "refreshes": dict(self.refreshes)}
+
+
+def scaled_gaussian(ksize, sigma, scale=1.0):
+    """((ksize, ksize), sigma) of a GaussianBlur resized along with the image.
+
+    A preview at `scale` times the full resolution blurs by the same amount
+    relative to the picture; at scale 1.0 the parameters are unchanged.
+    """
+    if scale != 1.0:
+        ksize = max(1, int(round(ksize * scale)) | 1)
+        sigma = sigma * scale
+    return (ksize, ksize), sigma
+
+
+def proxy_scale(full_shape, size):
+    """Linear scale of a (width, height) proxy relative to a full-resolution shape."""
+    return ((size[0] * size[1]) / (full_shape[1] * full_shape[0])) ** 0.5
+
+
+class ImagePyramid:
+    """A source image with half-size levels (cv2.pyrDown), built on demand.
+
+    proxy() resizes from the smallest level that is still at least the
+    requested size, so previews of a large image stay cheap and are
+    properly low-pass filtered. levels[0] is the full-resolution source.
+    With a BufferPool the levels are written into its arrays.
+    """
+
+    def __init__(self, image, pool=None):
+        self.levels = [image]
+        self.pool = pool
+
+    @property
+    def full(self):
+        return self.levels[0]
+
+    def level_for(self, size):
+        width, height = size
+        level = self.levels[0]
+        index = 1
+        while True:
+            h, w = level.shape[:2]
+            if (w + 1) // 2 < width or (h + 1) // 2 < height:
+                return level
+            if index == len(self.levels):
+                shape = ((h + 1) // 2, (w + 1) // 2) + level.shape[2:]
+                out = self.pool.get(("pyramid", index), shape, level.dtype) if self.pool is not None else None
+                self.levels.append(cv2.pyrDown(level, dst=out))
+            level = self.levels[index]
+            index += 1
+
+    def proxy(self, size, out=None):
+        """The source at size=(width, height) and its scale relative to full resolution."""
+        level = self.level_for(size)
+        if level.shape[1::-1] != tuple(size):
+            level = cv2.resize(level, tuple(size), dst=out, interpolation=cv2.INTER_AREA)
+        return level, proxy_scale(self.full.shape, size)
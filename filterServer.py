@@ -0,0 +1,306 @@
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import concurrent.futures
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import cv2
+import numpy as np
+
+from batchFilters import FORMATS
+from filterChain import FilterChain, filter_names
+from metrics import Histogram
+from resultCache import ResultCache, image_digest
+
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp"}
+
+
+class ServiceBusy(Exception):
+    """The request queue is full; the client should retry later."""
+
+
+class FilterService:
+    """Decodes, filters and encodes images on a worker pool, in micro-batches.
+
+    submit() puts a request on a bounded queue and returns a Future, or
+    raises ServiceBusy when the queue is full. A dispatcher thread groups
+    queued requests for the same filter chain, for up to `batch_window_ms`
+    or `max_batch` requests, and hands each group to a worker. A worker
+    runs the whole group with one FilterChain; same-sized images under a
+    pointwise chain (LUTs and colour matrices only) are stacked and
+    filtered in a single pass. With a resultCache.ResultCache, images that
+    were filtered before are served from it.
+    """
+
+    def __init__(self, workers=4, queue_size=64, max_batch=8, batch_window_ms=5, cache=None):
+        self.requests = queue.Queue(maxsize=queue_size)
+        self.max_batch = max_batch
+        self.cache = cache
+        self.window = batch_window_ms / 1000.0
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FilterService")
+        # Batches handed to the pool but not finished; when all workers are
+        # busy the dispatcher waits, the queue fills and submit() says busy
+        self.in_flight = threading.Semaphore(workers * 2)
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stats = {"requests": 0, "completed": 0, "failed": 0, "rejected": 0,
+                      "batches": 0, "stacked_batches": 0, "bytes_in": 0, "bytes_out": 0}
+        self.latency = Histogram()  # Submit to result, per request
+        self.filter_latency = {}  # Chain -> Histogram of per-image filter time
+        self.dispatcher = threading.Thread(target=self._dispatch, name="FilterService-dispatch", daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, data, filters, fmt="png", quality=None):
+        """Queue one encoded image; the Future resolves to (encoded bytes, content type)."""
+        future = concurrent.futures.Future()
+        request = (tuple(filters), bytes(data), fmt, quality, future, time.perf_counter())
+        try:
+            self.requests.put_nowait(request)
+        except queue.Full:
+            with self.lock:
+                self.stats["rejected"] += 1
+            raise ServiceBusy()
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += len(data)
+        return future
+
+    def _dispatch(self):
+        pending = {}  # chain -> (deadline, [requests])
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, min(deadline for deadline, _ in pending.values()) - time.perf_counter())
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                request = False
+            if request is None:
+                break
+            if request:
+                chain = request[0]
+                if chain not in pending:
+                    pending[chain] = (time.perf_counter() + self.window, [])
+                pending[chain][1].append(request)
+                if len(pending[chain][1]) >= self.max_batch:
+                    self._flush(pending.pop(chain)[1])
+            now = time.perf_counter()
+            for chain in [chain for chain, (deadline, _) in pending.items() if deadline <= now]:
+                self._flush(pending.pop(chain)[1])
+        for _, batch in pending.values():
+            self._flush(batch)
+
+    def _flush(self, batch):
+        self.in_flight.acquire()
+        future = self.pool.submit(self._run_batch, batch)
+        future.add_done_callback(lambda _: self.in_flight.release())
+
+    def _run_batch(self, batch):
+        chain = FilterChain(batch[0][0])
+        images = []
+        for filters, data, fmt, quality, future, _ in batch:
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                self._finish(future, error=ValueError("Cannot decode image"))
+            else:
+                images.append((image, fmt, quality, future))
+        if not images:
+            return
+
+        start = time.perf_counter()
+        try:
+            results = self._filter(chain, [image for image, _, _, _ in images])
+        except Exception as error:
+            # Fail the whole batch now rather than leave its clients to time out
+            for _, _, _, future in images:
+                self._finish(future, error=error)
+            return
+        per_image = (time.perf_counter() - start) / max(len(images), 1)
+        with self.lock:
+            self.stats["batches"] += 1
+            histogram = self.filter_latency.setdefault("+".join(chain.filter_names), Histogram())
+            for _ in images:
+                histogram.observe(per_image * 1000)
+
+        for result, (_, fmt, quality, future) in zip(results, images):
+            try:
+                ok, encoded = cv2.imencode(f".{fmt}", result, FORMATS[fmt](quality))
+                if not ok:
+                    raise ValueError(f"Cannot encode {fmt}")
+                self._finish(future, (encoded.tobytes(), CONTENT_TYPES[fmt]))
+            except Exception as error:
+                self._finish(future, error=error)
+
+    def _filter(self, chain, images):
+        if self.cache is None:
+            return self._compute(chain, images)
+        keys = [self.cache.key(image_digest(image), chain.filter_names) for image in images]
+        results = [self.cache.get(key) for key in keys]
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            for index, result in zip(missing, self._compute(chain, [images[index] for index in missing])):
+                self.cache.put(keys[index], result)
+                results[index] = result
+        return results
+
+    def _compute(self, chain, images):
+        shapes = {image.shape for image in images}
+        if chain.pointwise and len(images) > 1 and len(shapes) == 1:
+            # One pass over all the images stacked on top of each other
+            with self.lock:
+                self.stats["stacked_batches"] += 1
+            stacked = chain.apply(np.concatenate(images, axis=0))
+            return np.split(stacked, len(images), axis=0)
+        return [chain.apply(image) for image in images]
+
+    def _finish(self, future, result=None, error=None):
+        with self.lock:
+            if error is None:
+                self.stats["completed"] += 1
+                self.stats["bytes_out"] += len(result[0])
+            else:
+                self.stats["failed"] += 1
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def snapshot(self):
+        """Counters, throughput and latency percentiles, for the /stats endpoint."""
+        with self.lock:
+            uptime = time.perf_counter() - self.started
+            stats = dict(self.stats)
+            stats.update({
+                "uptime_s": uptime,
+                "queued": self.requests.qsize(),
+                "requests_per_s": stats["completed"] / uptime if uptime > 0 else 0.0,
+                "mean_batch": stats["completed"] / stats["batches"] if stats["batches"] else 0.0,
+                "latency": self.latency.snapshot(),
+                "filters": {chain: histogram.snapshot() for chain, histogram in self.filter_latency.items()},
+            })
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+    def record_latency(self, seconds):
+        with self.lock:
+            self.latency.observe(seconds * 1000)
+
+    def shutdown(self):
+        self.requests.put(None)
+        self.dispatcher.join()
+        self.pool.shutdown(wait=True)
+
+
+class FilterHandler(BaseHTTPRequestHandler):
+    """POST /filter?filter=Sepia&filter=Cairo&format=jpg&quality=90 with the image as body.
+
+    Repeated `filter` parameters form a chain. GET /filters lists the
+    filter names and GET /stats returns the service statistics.
+    """
+
+    service = None  # Set by make_server
+    timeout_s = 30.0
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/stats":
+            self._send_json(200, self.service.snapshot())
+        elif path == "/filters":
+            self._send_json(200, filter_names())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/filter":
+            self._send_json(404, {"error": "not found"})
+            return
+        query = parse_qs(url.query)
+        filters = query.get("filter", [])
+        fmt = query.get("format", ["png"])[0]
+        quality = query.get("quality", [None])[0]
+        known = filter_names()
+        unknown = [name for name in filters if name not in known]
+        if not filters or unknown:
+            self._send_json(400, {"error": f"unknown or missing filter: {unknown}", "filters": known})
+            return
+        if fmt not in FORMATS:
+            self._send_json(400, {"error": f"format must be one of {sorted(FORMATS)}"})
+            return
+
+        start = time.perf_counter()
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            future = self.service.submit(data, filters, fmt, int(quality) if quality is not None else None)
+            body, content_type = future.result(timeout=self.timeout_s)
+        except ServiceBusy:
+            self._send_json(503, {"error": "busy, retry later"}, {"Retry-After": "1"})
+            return
+        except concurrent.futures.TimeoutError:
+            self._send_json(504, {"error": "timed out"})
+            return
+        except ValueError as error:
+            self._send_json(400, {"error": str(error)})
+            return
+        except Exception as error:
+            self._send_json(500, {"error": str(error)})
+            return
+        self.service.record_latency(time.perf_counter() - start)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # One line per request would dominate the output under load
+
+
+def make_server(service, host="127.0.0.1", port=8080):
+    """An HTTP server for the service; port 0 picks a free port (see server.server_port)."""
+    handler = type("Handler", (FilterHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the photo filters over HTTP on this machine.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-j", "--workers", type=int, default=4, help="decode/filter/encode threads")
+    parser.add_argument("--queue-size", type=int, default=64, help="requests queued before answering 503")
+    parser.add_argument("--max-batch", type=int, default=8, help="requests filtered together at most")
+    parser.add_argument("--batch-window-ms", type=float, default=5, help="time to wait for a batch to fill")
+    parser.add_argument("--cache", help="directory of a result cache for repeated requests")
+    parser.add_argument("--cache-mb", type=float, default=1024, help="size limit of the result cache (default 1024)")
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.cache, int(args.cache_mb * 2 ** 20)) if args.cache else None
+    service = FilterService(args.workers, args.queue_size, args.max_batch, args.batch_window_ms, cache)
+    server = make_server(service, args.host, args.port)
+    print(f"Serving filters on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import os
+import time
+import collections
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+# Quality steps given up in order as the frame cost exceeds the target:
+# thumbnails are refreshed less often first, then everything is filtered at
+# a smaller proxy resolution. The selected preview goes last: past the final
+# step only the frame rate itself drops.
+LEVELS = (
+    {"thumbnail_every": 1, "proxy": 1.0},
+    {"thumbnail_every": 2, "proxy": 1.0},
+    {"thumbnail_every": 4, "proxy": 1.0},
+    {"thumbnail_every": 4, "proxy": 0.75},
+    {"thumbnail_every": 8, "proxy": 0.5},
+)
+
+
+class FrameScheduler(QObject):
+    """Calls an app's frame function at an adaptive rate, in place of a fixed QTimer.
+
+    Ticks run on a single-shot timer that is re-armed after each tick, so a
+    slow tick delays the next one instead of letting ticks pile up. The cost
+    of a frame is the tick's own duration, or what the app reports for work
+    it hands to other threads, smoothed over a few frames. When the cost
+    stays above the target the scheduler steps down LEVELS; when it stays
+    well below, it steps back up.
+
+    The current decision is in state(); every change of level is emitted
+    through `changed(state)` and kept in `decisions`.
+    """
+
+    changed = pyqtSignal(dict)
+
+    def __init__(self, tick, target_ms=30, levels=LEVELS, degrade_after=5, recover_after=30, headroom=0.6):
+        super().__init__()
+        self.tick = tick
+        self.target = target_ms / 1000.0
+        self.levels = levels
+        self.degrade_after = degrade_after  # Ticks over the target before stepping down
+        self.recover_after = recover_after  # Ticks under headroom * target before stepping up
+        self.headroom = headroom
+        self.level = 0
+        self.cost = 0.0  # Smoothed seconds per frame
+        self.interval = self.target
+        self.reported = None
+        self.over = 0
+        self.under = 0
+        self.decisions = collections.deque(maxlen=100)
+        self.running = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._run)
+
+    @classmethod
+    def from_env(cls, tick, target_ms):
+        """A scheduler whose target can be overridden with FILTER_TARGET_MS."""
+        return cls(tick, float(os.environ.get("FILTER_TARGET_MS", target_ms)))
+
+    @property
+    def thumbnail_every(self):
+        return self.levels[self.level]["thumbnail_every"]
+
+    @property
+    def proxy(self):
+        return self.levels[self.level]["proxy"]
+
+    def state(self):
+        return {
+            "level": self.level,
+            "thumbnail_every": self.thumbnail_every,
+            "proxy": self.proxy,
+            "target_ms": self.target * 1000,
+            "cost_ms": self.cost * 1000,
+            "interval_ms": self.interval * 1000,
+        }
+
+    def start(self):
+        self.running = True
+        self.timer.start(0)
+
+    def stop(self):
+        self.running = False
+        self.timer.stop()
+
+    def isActive(self):
+        return self.running
+
+    def report(self, seconds):
+        """Cost of work the tick handed to other threads (e.g. tile workers) for this frame."""
+        self.reported = seconds if self.reported is None else max(self.reported, seconds)
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.tick()
+        finally:
+            elapsed = time.perf_counter() - start
+            cost = max(elapsed, self.reported or 0.0)
+            self.reported = None
+            self._adapt(cost)
+            if self.running:
+                self.timer.start(int(max(0.0, self.interval - elapsed) * 1000))
+
+    def _adapt(self, cost):
+        self.cost = cost if not self.cost else 0.8 * self.cost + 0.2 * cost
+        if self.cost > self.target:
+            self.over, self.under = self.over + 1, 0
+        elif self.cost < self.target * self.headroom:
+            self.over, self.under = 0, self.under + 1
+        else:
+            self.over = self.under = 0
+
+        if self.over >= self.degrade_after and self.level < len(self.levels) - 1:
+            self._set_level(self.level + 1, "over target")
+        elif self.under >= self.recover_after and self.level > 0:
+            self._set_level(self.level - 1, "under target")
+
+        # On the last level only the frame rate is left to give: the interval
+        # stretches past the cost so the GUI still gets time for events
+        if self.level == len(self.levels) - 1 and self.cost > self.target:
+            self.interval = 1.25 * self.cost
+        else:
+            self.interval = self.target
+
+    def _set_level(self, level, reason):
+        self.level = level
+        self.over = self.under = 0
+        state = self.state()
+        self.decisions.append((time.time(), reason, state))
+        self.changed.emit(state)
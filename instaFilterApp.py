@@ -0,0 +1,162 @@
+import sys
+import cv2
+import datetime
+from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout
+from PyQt5.QtCore import Qt, pyqtSignal
+from filterEngine import scratch_stats, BufferPool, ImagePyramid
+from instaFilters import FILTERS, apply_filter
+from cameraCapture import CameraCapture
+from qtBridge import FrameDisplay, MetricsOverlay
+from exportQueue import ExportQueue, BURST_FRAMES
+from metrics import Metrics
+from frameScheduler import FrameScheduler
+from dirtyRegions import IncrementalOutputs
+import multiFilter
+
+PREVIEW_SIZE = (800, 500)
+
+class InstaFilterApp(QWidget):
+    first_frame = pyqtSignal()  # Emitted once, when the first frame is on screen
+
+    def __init__(self):
+        super().__init__()
+        self.frame_shown = False
+
+        self.filters = list(FILTERS)
+        self.current_filter_index = 0
+        self.cap = CameraCapture(0)
+        self.display = FrameDisplay()
+        self.buffers = BufferPool()
+        self.graph_buffers = {}
+        # Only the parts of the picture that changed since the last frame are re-filtered
+        self.incremental = IncrementalOutputs.from_env()
+        # Saves are filtered and encoded on writer threads, off the GUI thread
+        self.exporter = ExportQueue()
+        self.exporter.exported.connect(self.on_exported)
+
+        self.initUI()
+
+        # Frames are scheduled against a 20 ms budget; under load the preview is
+        # filtered at a smaller proxy size, then the frame rate drops
+        self.scheduler = FrameScheduler.from_env(self.update_frame, target_ms=20)
+        # Filter timings, FPS and missed ticks; off unless FILTER_METRICS is set
+        self.metrics = Metrics.from_env(target_interval_ms=self.scheduler.target * 1000)
+        self.overlay = MetricsOverlay.attach(self, self.metrics)
+        self.scheduler.start()
+
+    def initUI(self):
+        self.setWindowTitle('Insta Filters')
+        self.setGeometry(100, 100, 500, 500)
+
+        # Layouts
+        self.layout = QVBoxLayout()
+
+        # Filter name label
+        self.filter_name_label = QLabel(self.filters[self.current_filter_index])
+        self.layout.addWidget(self.filter_name_label, alignment=Qt.AlignCenter)
+
+        # Preview label
+        self.preview_label = QLabel(self)
+        self.layout.addWidget(self.preview_label, alignment=Qt.AlignCenter)
+
+        # Next and Previous buttons
+        self.button_layout = QHBoxLayout()
+
+        self.prev_button = QPushButton('Previous')
+        self.prev_button.clicked.connect(self.prev_filter)
+        self.button_layout.addWidget(self.prev_button)
+
+        self.next_button = QPushButton('Next')
+        self.next_button.clicked.connect(self.next_filter)
+        self.button_layout.addWidget(self.next_button)
+
+        self.layout.addLayout(self.button_layout)
+
+        # Save button
+        self.save_button = QPushButton('Save')
+        self.save_button.clicked.connect(self.save_frame)
+        self.layout.addWidget(self.save_button)
+
+        # Burst button: saves the next frames in a row
+        self.burst_button = QPushButton(f'Burst ({BURST_FRAMES})')
+        self.burst_button.clicked.connect(self.save_burst)
+        self.layout.addWidget(self.burst_button)
+
+        # Export progress, shown without interrupting the preview
+        self.status_label = QLabel()
+        self.layout.addWidget(self.status_label, alignment=Qt.AlignCenter)
+
+        self.setLayout(self.layout)
+
+    def update_frame(self):
+        self.metrics.tick(camera_dropped=self.cap.dropped, scheduler_level=self.scheduler.level,
+                          reuse_ratio=round(self.incremental.reuse_ratio(), 2),
+                          scratch_mb=round(scratch_stats()["bytes"] / 2 ** 20, 1))
+        ret, frame = self.cap.read()
+        if ret:
+            # Filter a proxy no larger than the camera frame and only scale the result up
+            # to the preview size. Every step writes into buffers kept across frames.
+            h, w = frame.shape[:2]
+            proxy = self.scheduler.proxy
+            size = (min(w, int(PREVIEW_SIZE[0] * proxy)), min(h, int(PREVIEW_SIZE[1] * proxy)))
+            frame, _ = ImagePyramid(frame, self.buffers).proxy(size, self.buffers.get("proxy", (size[1], size[0], 3)))
+            frame = cv2.flip(frame, 1, dst=self.buffers.get("flipped", frame.shape))
+            filter_name = self.filters[self.current_filter_index]
+            graph = multiFilter.FrameGraph(frame, self.graph_buffers, metrics=self.metrics)
+            filtered_frame = self.incremental.output(graph, filter_name)
+            if size != PREVIEW_SIZE:
+                filtered_frame = cv2.resize(filtered_frame, PREVIEW_SIZE, dst=self.buffers.get(
+                    "preview", PREVIEW_SIZE[::-1] + filtered_frame.shape[2:]))
+            self.display.show(self.preview_label, filtered_frame)
+            self.metrics.frame_done(self.cap.captured_at)
+            if not self.frame_shown:
+                self.frame_shown = True
+                self.first_frame.emit()
+
+    def prev_filter(self):
+        self.current_filter_index = (self.current_filter_index - 1) % len(self.filters)
+        self.filter_name_label.setText(self.filters[self.current_filter_index])
+
+    def next_filter(self):
+        self.current_filter_index = (self.current_filter_index + 1) % len(self.filters)
+        self.filter_name_label.setText(self.filters[self.current_filter_index])
+
+    def save_frame(self):
+        ret, frame = self.cap.latest()
+        if ret:
+            # The selected filter is applied and the file written on a writer thread
+            filter_name = self.filters[self.current_filter_index]
+            timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = self.exporter.submit(frame, self.full_resolution_render(filter_name), f'{filter_name}_{timestamp}')
+            self.status_label.setText(f'Saving {filename}...' if filename else 'Still saving, try again in a moment')
+
+    def save_burst(self):
+        filter_name = self.filters[self.current_filter_index]
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.exporter.burst(self.cap, BURST_FRAMES, self.full_resolution_render(filter_name), f'{filter_name}_{timestamp}')
+        self.status_label.setText(f'Saving a burst of {BURST_FRAMES} frames...')
+
+    @staticmethod
+    def full_resolution_render(filter_name):
+        # Runs on a writer thread, on the camera frame as captured
+        return lambda frame: apply_filter(cv2.flip(frame, 1), filter_name)
+
+    def on_exported(self, filename, error):
+        # Called on the GUI thread when a save has finished
+        if error is None:
+            self.status_label.setText(f'Image saved as {filename}')
+            print(f'Image saved as {filename}')
+        else:
+            self.status_label.setText(f'Could not save {filename}: {error}')
+
+    def closeEvent(self, event):
+        self.scheduler.stop()
+        self.exporter.shutdown()  # Let queued saves finish
+        self.cap.release()
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    window = InstaFilterApp()
+    window.show()
+    sys.exit(app.exec_())
+
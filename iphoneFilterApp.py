@@ -0,0 +1,391 @@
+import sys
+import cv2
+import datetime
+from PyQt5.QtCore import Qt, QPoint, pyqtSignal
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QApplication, QLabel, QVBoxLayout, QWidget, QScrollArea, QHBoxLayout, QPushButton, QFileDialog, QListWidget, QAbstractItemView
+from filterEngine import scratch_stats, BufferPool, ImagePyramid
+from iphoneFilters import FILTERS, apply_filter
+from cameraCapture import CameraCapture
+import multiFilter
+from qtBridge import FrameDisplay, MetricsOverlay
+from exportQueue import ExportQueue, BURST_FRAMES
+from metrics import Metrics
+from frameScheduler import FrameScheduler
+from dirtyRegions import IncrementalOutputs
+import editStack
+import filterChain
+
+# Thumbnails within this many pixels of the scroll viewport count as visible
+PREFETCH_MARGIN = 120
+# Off-screen thumbnails are refreshed one at a time, every this many ticks
+OFFSCREEN_TICKS = 4
+
+class IphoneFilterApp(QWidget):
+    first_frame = pyqtSignal()  # Emitted once, when the first thumbnail is on screen
+
+    def __init__(self):
+        super().__init__()
+        self.frame_shown = False
+
+        self.setWindowTitle("Iphone Filters")
+        self.setGeometry(100, 100, 1090, 1080)
+        self.cap = None  
+        self.selected_filter = "Original"
+        self.current_image = None  
+        self.source = None  # ImagePyramid of the loaded image, kept for full-resolution saves
+        self.display = FrameDisplay()
+        self.buffers = BufferPool()
+        self.filter_buffers = {}
+        self.incremental = IncrementalOutputs.from_env()
+        # Looks added to a loaded image, each stage's output cached (see EditStack)
+        self.edits = editStack.EditStack()
+        # Saves are filtered and encoded on writer threads, off the GUI thread
+        self.exporter = ExportQueue()
+        self.exporter.exported.connect(self.on_exported)
+
+        # Create layout
+        main_layout = QHBoxLayout()
+
+        # Left section with preview, buttons, and save button
+        left_layout = QVBoxLayout()
+
+        # Top section: Three buttons for loading, uploading, or opening the camera
+        self.load_sample_button = QPushButton("Load Sample Image")
+        self.upload_image_button = QPushButton("Upload Image")
+        self.open_camera_button = QPushButton("Open Camera")
+
+        self.load_sample_button.clicked.connect(self.load_sample_image)
+        self.upload_image_button.clicked.connect(self.upload_image)
+        self.open_camera_button.clicked.connect(self.open_camera)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.load_sample_button)
+        button_layout.addWidget(self.upload_image_button)
+        button_layout.addWidget(self.open_camera_button)
+
+        left_layout.addLayout(button_layout)
+
+        # Middle section: Preview of the selected filter
+        self.preview_label = QLabel()
+        self.preview_label.setFixedSize(640, 480)
+        left_layout.addWidget(self.preview_label, alignment=Qt.AlignCenter)
+
+        # Edits of a loaded image: looks stacked in order, drag to reorder
+        self.edit_list = QListWidget()
+        self.edit_list.setFlow(QListWidget.LeftToRight)
+        self.edit_list.setFixedHeight(40)
+        self.edit_list.setDragDropMode(QAbstractItemView.InternalMove)
+        for signal in (self.edit_list.model().rowsInserted, self.edit_list.model().rowsMoved,
+                       self.edit_list.model().rowsRemoved):
+            signal.connect(self.sync_edits)
+        self.add_edit_button = QPushButton("Add Look to Edits")
+        self.add_edit_button.clicked.connect(self.add_edit)
+        self.remove_edit_button = QPushButton("Remove Edit")
+        self.remove_edit_button.clicked.connect(self.remove_edit)
+        edit_layout = QHBoxLayout()
+        edit_layout.addWidget(self.edit_list)
+        edit_layout.addWidget(self.add_edit_button)
+        edit_layout.addWidget(self.remove_edit_button)
+        left_layout.addLayout(edit_layout)
+        self.set_edits_enabled(False)
+
+        # Bottom section: Save button
+        self.save_button = QPushButton("Save Filtered Image")
+        self.save_button.clicked.connect(self.save_image)
+        left_layout.addWidget(self.save_button)
+
+        # Burst button: saves the next camera frames in a row
+        self.burst_button = QPushButton(f"Burst ({BURST_FRAMES})")
+        self.burst_button.clicked.connect(self.save_burst)
+        left_layout.addWidget(self.burst_button)
+
+        # Export progress, shown without interrupting the preview
+        self.status_label = QLabel()
+        left_layout.addWidget(self.status_label, alignment=Qt.AlignCenter)
+
+        main_layout.addLayout(left_layout)
+
+        # Right section: Vertical scrollable area with filters
+        self.scroll_area = QScrollArea()
+        scroll_widget = QWidget()
+        scroll_layout = QVBoxLayout(scroll_widget)
+
+        self.frames = {}  # Store filter names and associated QLabel for each filter
+        for filter_name in FILTERS:
+            vbox = QVBoxLayout()
+            label = QLabel()
+            label.setFixedSize(320, 240)
+            label.setScaledContents(True)  # Thumbnails rendered at a reduced proxy size still fill it
+            filter_text = QLabel(filter_name, alignment=Qt.AlignCenter)
+            vbox.addWidget(label)
+            vbox.addWidget(filter_text)
+            scroll_layout.addLayout(vbox)
+            self.frames[filter_name] = label
+
+        self.scroll_area.setWidget(scroll_widget)
+        self.scroll_area.setWidgetResizable(True)
+        main_layout.addWidget(self.scroll_area)
+
+        # Only thumbnails in (or near) the viewport are rendered at full rate; the
+        # rest catch up when they are scrolled into view
+        self.still_frame = None  # Thumbnail-sized still image, when not on camera
+        self.stale = set()  # Thumbnails not yet showing the still image
+        self.offscreen_turn = 0
+        self.ticks = 0
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self.render_stale)
+
+        self.setLayout(main_layout)
+
+        # Frames are scheduled against a 30 ms budget (only while the camera is open);
+        # under load the thumbnails are refreshed less often, then rendered smaller,
+        # before the selected preview slows
+        self.scheduler = FrameScheduler.from_env(self.update_frames, target_ms=30)
+
+        # Filter timings, FPS and missed ticks; off unless FILTER_METRICS is set
+        self.metrics = Metrics.from_env(target_interval_ms=self.scheduler.target * 1000)
+        self.overlay = MetricsOverlay.attach(self, self.metrics)
+
+    def update_frames(self):
+        if self.cap is None:
+            return
+        
+        self.metrics.tick(camera_dropped=self.cap.dropped, scheduler_level=self.scheduler.level,
+                          reuse_ratio=round(self.incremental.reuse_ratio(), 2),
+                          scratch_mb=round(scratch_stats()["bytes"] / 2 ** 20, 1))
+        ret, frame = self.cap.read()
+        if ret:
+            # The thumbnails are filtered on a 320x240 proxy of the frame (smaller under
+            # load); every step writes into buffers kept across frames, so the loop
+            # doesn't allocate
+            size = (int(320 * self.scheduler.proxy), int(240 * self.scheduler.proxy))
+            frame, _ = ImagePyramid(frame, self.buffers).proxy(size, self.buffers.get("small", size[::-1] + (3,)))
+            frame = cv2.flip(frame, 1, dst=self.buffers.get("flipped", frame.shape))
+
+            # Apply the due filters and display; Mono, Silvertone and Noir share one grayscale
+            self.render_tiles(frame, self.due_filters(), self.filter_buffers, self.incremental)
+            self.metrics.frame_done(self.cap.captured_at)
+
+    def visible_filters(self):
+        """Filters whose thumbnail is in the scroll viewport or within PREFETCH_MARGIN of it."""
+        viewport = self.scroll_area.viewport()
+        visible = []
+        for filter_name, label in self.frames.items():
+            top = label.mapTo(viewport, QPoint(0, 0)).y()
+            if top + label.height() > -PREFETCH_MARGIN and top < viewport.height() + PREFETCH_MARGIN:
+                visible.append(filter_name)
+        return visible
+
+    def due_filters(self):
+        # The selected filter every tick, visible thumbnails every tick the
+        # scheduler allows, plus one off-screen thumbnail every OFFSCREEN_TICKS
+        # of those in turn, so the cost follows the viewport rather than the
+        # length of the list
+        self.ticks += 1
+        due = []
+        if self.ticks % self.scheduler.thumbnail_every == 0:
+            due = self.visible_filters()
+        if self.selected_filter in self.frames and self.selected_filter not in due:
+            due.append(self.selected_filter)
+        if self.ticks % (OFFSCREEN_TICKS * self.scheduler.thumbnail_every) == 0:
+            offscreen = [name for name in FILTERS if name not in due]
+            if offscreen:
+                self.offscreen_turn = (self.offscreen_turn + 1) % len(offscreen)
+                due.append(offscreen[self.offscreen_turn])
+        return due
+
+    def render_tiles(self, frame, filter_names, buffers=None, incremental=None):
+        # With `incremental` (camera frames) each filter only re-filters what changed
+        graph = multiFilter.FrameGraph(frame, buffers, metrics=self.metrics)
+        for filter_name in filter_names:
+            if incremental is not None:
+                self.display_frame(incremental.output(graph, filter_name), filter_name)
+            else:
+                self.display_frame(graph.output(filter_name), filter_name)
+
+    def render_stale(self):
+        # Still image: render the thumbnails that have come into view since it was loaded
+        if self.still_frame is None or self.cap is not None:
+            return
+        due = [name for name in self.visible_filters() if name in self.stale]
+        if self.selected_filter in self.stale and self.selected_filter not in due:
+            due.append(self.selected_filter)
+        if due:
+            self.stale.difference_update(due)
+            self.render_tiles(self.edited_frame(), due)
+
+    def edited_frame(self):
+        # The still image after the edits so far; thumbnails show each look on top of it
+        frame = self.edits.output()
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)  # After Mono, Silvertone or Noir
+        return frame
+
+    def set_edits_enabled(self, enabled):
+        for widget in (self.edit_list, self.add_edit_button, self.remove_edit_button):
+            widget.setEnabled(enabled)
+
+    def add_edit(self):
+        # Stack the selected look on the image; its thumbnail becomes the new base
+        if self.still_frame is None or self.selected_filter == "Original":
+            return
+        look, self.selected_filter = self.selected_filter, "Original"
+        self.edit_list.addItem(look)  # sync_edits updates the stack
+
+    def remove_edit(self):
+        row = self.edit_list.currentRow()
+        if row < 0:
+            row = self.edit_list.count() - 1
+        if row >= 0:
+            self.edit_list.takeItem(row)  # sync_edits updates the stack
+
+    def sync_edits(self, *args):
+        # Rows were added, dragged or removed in the list: the stack follows it
+        names = [self.edit_list.item(row).text() for row in range(self.edit_list.count())]
+        if names != self.edits.stages:
+            self.edits.set_stages(names)
+            self.edits_changed()
+
+    def edits_changed(self):
+        # Only the stages from the first changed one on are recomputed
+        if self.still_frame is None:
+            return
+        self.stale = set(FILTERS)
+        self.render_stale()
+
+    def display_frame(self, frame, filter_name):
+        # Wrap the frame for PyQt as it is (gray or BGR), reusing this tile's pixmap
+        pixmap = self.display.pixmap(filter_name, frame)
+
+        # Display in the appropriate label
+        self.frames[filter_name].setPixmap(pixmap)
+        if not self.frame_shown:
+            self.frame_shown = True
+            self.first_frame.emit()
+
+        # If filter is selected, update the preview
+        if self.selected_filter == filter_name:
+            self.preview_label.setPixmap(pixmap.scaled(640, 480, Qt.KeepAspectRatio))
+            self.current_image = QPixmap(pixmap)  # Save the current image
+    
+    def load_sample_image(self):
+        # Stop camera and load a sample image
+        self.stop_camera()
+
+        # Load a sample image from disk
+        sample_image = cv2.imread("sample.jpg")
+        # self.display_frame(sample_image, "Original")
+        self.update_display_with_image(sample_image)
+
+    def upload_image(self):
+        # Stop camera and allow user to upload an image
+        self.stop_camera()
+
+        # Open a file dialog to upload image
+        file_path, _ = QFileDialog.getOpenFileName(self, "Upload Image", "", "Image Files (*.png *.jpg *.jpeg)")
+        if file_path:
+            uploaded_image = cv2.imread(file_path)
+            self.update_display_with_image(uploaded_image)
+
+    def open_camera(self):
+        # Open the camera and start capturing frames
+        if self.cap is None:
+            self.still_frame = None
+            self.set_edits_enabled(False)
+            self.cap = CameraCapture(0)
+            self.scheduler.start()
+
+    def stop_camera(self):
+        # Stop the camera if it's running
+        if self.cap:
+            self.scheduler.stop()
+            self.cap.release()
+            self.cap = None
+
+    
+    def update_display_with_image(self,image):
+        # Thumbnails come from the image's pyramid; the full image is kept for saving
+        self.source = ImagePyramid(image)
+        self.still_frame, _ = self.source.proxy((320, 240))
+        self.edits.set_source(self.still_frame)
+        self.set_edits_enabled(True)
+        self.stale = set(FILTERS)
+        self.render_stale()
+
+
+    def save_image(self):
+        # Save the previewed image with the filter name
+        if self.selected_filter == "None":
+            return
+
+        # The selected filter is rendered at full resolution, not the preview's,
+        # and written on a writer thread
+        if self.cap is not None:
+            ret, image = self.cap.latest()
+            if not ret:
+                return
+        elif self.source is not None:
+            image = self.source.full
+        else:
+            return
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_name = self.exporter.submit(image, self.full_resolution_render(self.selected_filter),
+                                         f"{self.selected_filter}_{timestamp}")
+        self.status_label.setText(f"Saving {file_name}..." if file_name else "Still saving, try again in a moment")
+
+    def save_burst(self):
+        # Save the next camera frames with the selected filter
+        if self.cap is None:
+            self.status_label.setText("Open the camera to save a burst")
+            return
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.exporter.burst(self.cap, BURST_FRAMES, self.full_resolution_render(self.selected_filter),
+                            f"{self.selected_filter}_{timestamp}")
+        self.status_label.setText(f"Saving a burst of {BURST_FRAMES} frames...")
+
+    def full_resolution_render(self, filter_name):
+        # Runs on a writer thread; camera frames are mirrored like the preview
+        if self.cap is not None:
+            return lambda frame: apply_filter(cv2.flip(frame, 1), filter_name)
+        if self.edits.stages:
+            return filterChain.FilterChain(self.edits.stages + [filter_name]).apply
+        return lambda image: apply_filter(image, filter_name)
+
+    def on_exported(self, file_name, error):
+        # Called on the GUI thread when a save has finished
+        if error is None:
+            self.status_label.setText(f"Image saved as {file_name}")
+            print(f"Image saved as {file_name}")
+        else:
+            self.status_label.setText(f"Could not save {file_name}: {error}")
+
+    def mousePressEvent(self, event):
+        # Detect clicks on the right section to select the filter for preview
+        clicked_label = self.childAt(event.pos())
+        for filter_name, label in self.frames.items():
+            if clicked_label == label:
+                self.selected_filter = filter_name
+                self.update_preview(filter_name)
+                break
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.render_stale()  # A taller window may show more thumbnails
+
+    def closeEvent(self, event):
+        self.stop_camera()
+        self.exporter.shutdown()  # Let queued saves finish
+
+    def update_preview(self, filter_name):
+        # Display the selected filter's frame in the preview
+        pixmap = self.frames[filter_name].pixmap()
+        if pixmap:
+            self.preview_label.setPixmap(pixmap.scaled(640, 480, Qt.KeepAspectRatio))
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = IphoneFilterApp()
+    window.show()
+    sys.exit(app.exec_())
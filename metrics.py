@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import bisect
+import threading
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 16, 25, 33, 50, 100, 250, 500, 1000, float("inf"))
+
+
+class Histogram:
+    """Latency histogram over fixed BUCKETS_MS buckets."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": self.max_ms,
+            "buckets": dict(zip(map(str, BUCKETS_MS), self.counts)),
+        }
+
+
+class Metrics:
+    """Timings of the hot path of one app: filters, frames and timer ticks.
+
+    Histograms are keyed by (family, label): ("filter", name) for every
+    filter dispatch, ("frame_latency", None) from camera capture to display
+    and ("tick_interval", None) between QTimer ticks. Ticks that arrive
+    later than the timer's interval count as missed.
+
+    When disabled every method returns straight away and wrap() hands back
+    the function unchanged, so instrumented code costs next to nothing.
+    """
+
+    def __init__(self, enabled=False, target_interval_ms=30):
+        self.enabled = enabled
+        self.target_ms = target_interval_ms
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.gauges = {}
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.frames = 0
+        self.fps = 0.0
+        self.last_tick = None
+        self.last_frame = None
+        self.exporter = None
+
+    @classmethod
+    def from_env(cls, target_interval_ms):
+        """Metrics configured by FILTER_METRICS=1 and/or FILTER_METRICS_FILE=<path>."""
+        path = os.environ.get("FILTER_METRICS_FILE")
+        metrics = cls(bool(os.environ.get("FILTER_METRICS") or path), target_interval_ms)
+        if path:
+            metrics.start_export(path, float(os.environ.get("FILTER_METRICS_INTERVAL", 5)))
+        return metrics
+
+    def observe(self, family, seconds, label=None):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get((family, label))
+            if histogram is None:
+                histogram = self.histograms[(family, label)] = Histogram()
+            histogram.observe(seconds * 1000)
+
+    def wrap(self, family, func, label=None):
+        """func, timed into the (family, label) histogram when enabled."""
+        if not self.enabled:
+            return func
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(family, time.perf_counter() - start, label)
+        return timed
+
+    def tick(self, **gauges):
+        """Call at the start of every QTimer tick; keyword arguments are stored as gauges."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        with self.lock:
+            self.ticks += 1
+            self.gauges.update(gauges)
+            last, self.last_tick = self.last_tick, now
+        if last is not None:
+            interval = now - last
+            self.observe("tick_interval", interval)
+            # A tick that comes k intervals late stands in for k - 1 ticks that never ran
+            missed = max(0, round(interval * 1000 / self.target_ms) - 1)
+            with self.lock:
+                self.missed_ticks += missed
+
+    def frame_done(self, captured_at):
+        """Call when a frame reaches the screen, with its capture time (time.perf_counter)."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if captured_at is not None:
+            self.observe("frame_latency", now - captured_at)
+        with self.lock:
+            self.frames += 1
+            if self.last_frame is not None and now > self.last_frame:
+                fps = 1.0 / (now - self.last_frame)
+                self.fps = fps if not self.fps else 0.9 * self.fps + 0.1 * fps
+            self.last_frame = now
+
+    def snapshot(self):
+        with self.lock:
+            histograms = {(family, label): histogram.snapshot() for (family, label), histogram in self.histograms.items()}
+            return {
+                "time": time.time(),
+                "fps": self.fps,
+                "target_fps": 1000.0 / self.target_ms,
+                "frames": self.frames,
+                "ticks": self.ticks,
+                "missed_ticks": self.missed_ticks,
+                "gauges": dict(self.gauges),
+                "frame_latency": histograms.get(("frame_latency", None)),
+                "tick_interval": histograms.get(("tick_interval", None)),
+                "filters": {label: value for (family, label), value in histograms.items() if family == "filter"},
+            }
+
+    def prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        with self.lock:
+            lines = [
+                "# TYPE photo_filters_fps gauge", f"photo_filters_fps {self.fps}",
+                "# TYPE photo_filters_frames_total counter", f"photo_filters_frames_total {self.frames}",
+                "# TYPE photo_filters_ticks_total counter", f"photo_filters_ticks_total {self.ticks}",
+                "# TYPE photo_filters_missed_ticks_total counter", f"photo_filters_missed_ticks_total {self.missed_ticks}",
+            ]
+            for name, value in self.gauges.items():
+                lines += [f"# TYPE photo_filters_{name} gauge", f"photo_filters_{name} {value}"]
+            families = sorted({family for family, _ in self.histograms})
+            for family in families:
+                lines.append(f"# TYPE photo_filters_{family}_seconds histogram")
+                for (name, label), histogram in self.histograms.items():
+                    if name != family:
+                        continue
+                    tag = f'name="{label}",' if label is not None else ""
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS_MS, histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound / 1000)
+                        lines.append(f'photo_filters_{family}_seconds_bucket{{{tag}le="{le}"}} {cumulative}')
+                    braces = f"{{{tag.rstrip(',')}}}" if tag else ""
+                    lines.append(f"photo_filters_{family}_seconds_sum{braces} {histogram.total_ms / 1000}")
+                    lines.append(f"photo_filters_{family}_seconds_count{braces} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics to path: Prometheus text for .prom/.txt, JSON otherwise."""
+        if path.endswith((".prom", ".txt")):
+            text = self.prometheus()
+        else:
+            text = json.dumps(self.snapshot(), indent=2)
+        # Write then rename, so a scraper never reads a half-written file
+        temp = f"{path}.tmp"
+        with open(temp, "w") as f:
+            f.write(text)
+        os.replace(temp, path)
+
+    def start_export(self, path, interval=5.0):
+        """Write the metrics to `path` every `interval` seconds on a background thread."""
+        def export():
+            while True:
+                time.sleep(interval)
+                self.write(path)
+
+        self.exporter = threading.Thread(target=export, name="MetricsExport", daemon=True)
+        self.exporter.start()
+
+    def summary(self, top=5):
+        """A few lines for the overlay: FPS, missed ticks, latency and the costliest filters."""
+        data = self.snapshot()
+        latency = data["frame_latency"] or {"p50_ms": 0.0, "p99_ms": 0.0}
+        lines = [
+            f"FPS {data['fps']:.1f} / {data['target_fps']:.0f}   missed ticks {data['missed_ticks']}",
+            f"latency p50 {latency['p50_ms']:.0f} ms  p99 {latency['p99_ms']:.0f} ms",
+        ]
+        lines += [f"{name}: {value}" for name, value in data["gauges"].items()]
+        costliest = sorted(data["filters"].items(), key=lambda item: item[1]["mean_ms"], reverse=True)[:top]
+        lines += [f"{name}: {value['mean_ms']:.1f} ms avg, p99 {value['p99_ms']:.0f} ms" for name, value in costliest]
+        return "\n".join(lines)
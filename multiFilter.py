@@ -0,0 +1,177 @@
+import threading
+import concurrent.futures
+import cv2
+import numpy as np
+
+import basicFilters
+import iphoneFilters
+import filterChain
+from filterEngine import scaled_gaussian
+
+# The filter modules import this one, so their attributes are only looked
+# up when a node is computed.
+
+# Intermediates several filters compute from the same frame:
+# name -> (inputs, function of those inputs and an optional `out` array)
+INTERMEDIATES = {
+    "gray": (("frame",), lambda frame, out: cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out)),
+    "bgra": (("frame",), lambda frame, out: basicFilters.verify_alpha_channel(frame, out)),
+    "bgra_blur": (("bgra", "scale"),
+                  lambda bgra, scale, out: cv2.GaussianBlur(bgra, *scaled_gaussian(21, 11, scale), dst=out)),
+    "portrait_mask": (("gray",), lambda gray, out: basicFilters.portrait_mask(gray, out)),
+}
+
+# Filters that can reuse intermediates or need the frame's scale or tier:
+# name -> (inputs, function of those inputs and `out`)
+SHARED_FILTERS = {
+    "Sketch": (("frame", "gray"), lambda frame, gray, out: basicFilters.apply_sketch(frame, gray=gray, out=out)),
+    "HSVFilter": (("frame", "bgra"), lambda frame, bgra, out: basicFilters.apply_HSVFilter(frame, bgra=bgra, out=out)),
+    "Color OverLay": (("frame", "bgra"),
+                      lambda frame, bgra, out: basicFilters.apply_color_overlay(frame, bgra=bgra, out=out)),
+    "Blur": (("frame", "bgra", "bgra_blur", "scale", "region"),
+             lambda frame, bgra, blured, scale, region, out: basicFilters.apply_blur(
+                 frame, bgra=bgra, blured=blured, out=out, vignette=_region_vignette(frame, region, scale),
+                 scale=scale)),
+    "Portrait Mode": (("frame", "bgra", "bgra_blur", "scale", "portrait_mask"),
+                      lambda frame, bgra, blured, scale, mask, out: basicFilters.apply_portrait_mode(
+                          frame, None, bgra, blured, out, scale, mask)),
+    "HDR": (("frame", "scale", "tier"),
+            lambda frame, scale, tier, out: basicFilters.apply_HDR(frame, out=out, scale=scale, tier=tier)),
+    "Pencil Sketch": (("frame", "tier"),
+                      lambda frame, tier, out: basicFilters.apply_pencil_sketch(frame, out=out, tier=tier)),
+    "Gray Scale": (("frame", "gray"), lambda frame, gray, out: basicFilters.apply_greyscale(frame, gray=gray, out=out)),
+    "Mono": (("frame", "gray"),
+             lambda frame, gray, out: iphoneFilters.apply_mono(frame, gray=gray, out=out)),
+    "Silvertone": (("frame", "gray"),
+                   lambda frame, gray, out: iphoneFilters.apply_silvertone(frame, gray=gray, out=out)),
+    "Noir": (("frame", "gray"),
+             lambda frame, gray, out: iphoneFilters.apply_noir(frame, gray=gray, out=out)),
+}
+
+
+def _region_vignette(frame, region, scale):
+    # Blur's vignette is centred on the whole frame, not on a crop of it
+    if region is None:
+        return None
+    top, left, full_h, full_w = region
+    return basicFilters.vignette_weights(full_h, full_w, (top, left) + frame.shape[:2], scale)
+
+
+class FrameGraph:
+    """Per-frame dependency graph of filter outputs and shared intermediates.
+
+    Every node (an intermediate or a filter output) is computed at most once,
+    even when several threads ask for it at the same time. Outputs and
+    intermediates may share memory and must be treated as read-only.
+
+    `buffers` is an optional dict the caller keeps across frames: each node
+    then writes into the same array every frame instead of allocating, and
+    the previous frame's outputs are overwritten. The buffers are dropped
+    when the frame size changes.
+
+    `scale` is the frame's size relative to the full-resolution image it
+    previews; the blur kernels and HDR's sigma_s follow it. `tier` is
+    the quality tier of Pencil Sketch and HDR (see basicFilters.TIERS).
+    With `metrics` (see metrics.Metrics) every filter computation is timed;
+    in graphs made by crop() under "<filter>:partial".
+
+    `temporal` is an optional dict the caller keeps across frames, from
+    intermediate name (e.g. "portrait_mask") to a filterEngine.TemporalCache:
+    those intermediates are reused from earlier frames while the picture
+    stays still.
+
+    `region` = (top, left, full height, full width) places the frame inside
+    a larger one, for graphs made by crop().
+    """
+
+    def __init__(self, frame, buffers=None, scale=1.0, metrics=None, tier="exact", temporal=None, region=None):
+        self.frame = frame
+        self.buffers = buffers
+        if buffers is not None and buffers.get("frame_shape") != frame.shape:
+            buffers.clear()
+            buffers["frame_shape"] = frame.shape
+        self.scale = scale
+        self.tier = tier
+        self.temporal = temporal
+        self.region = region
+        self.parent = None  # (graph, (y0, y1, x0, x1)) for a crop of another graph
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.nodes = {}  # node name -> Future with its value
+        self.computed = []  # node keys, in the order they were computed
+
+    def _node(self, key, compute):
+        with self.lock:
+            future = self.nodes.get(key)
+            owner = future is None
+            if owner:
+                future = self.nodes[key] = concurrent.futures.Future()
+        if owner:
+            try:
+                out = self.buffers.get(key) if self.buffers is not None else None
+                result = compute(out)
+                if self.buffers is not None and result is not out:
+                    # First frame at this size: the node gets its own buffer from now on
+                    self.buffers[key] = np.empty_like(result)
+                future.set_result(result)
+                self.computed.append(key)
+            except BaseException as error:
+                future.set_exception(error)
+        return future.result()
+
+    def value(self, node):
+        """An intermediate of this frame ("gray", "bgra", "bgra_blur", "portrait_mask")."""
+        if node == "frame":
+            return self.frame
+        if node == "scale":
+            return self.scale
+        if node == "tier":
+            return self.tier
+        if node == "region":
+            return self.region
+        if self.parent is not None and self.parent[0].temporal and node in self.parent[0].temporal:
+            # Reused intermediates stay consistent with the rest of the frame
+            parent, (y0, y1, x0, x1) = self.parent
+            return parent.value(node)[y0:y1, x0:x1]
+        inputs, func = INTERMEDIATES[node]
+        compute = lambda out: func(*[self.value(name) for name in inputs], out)
+        cache = self.temporal.get(node) if self.temporal else None
+        if cache is not None:
+            return self._node(node, lambda out: cache.get(self.frame, compute, out))
+        return self._node(node, compute)
+
+    def crop(self, y0, y1, x0, x1):
+        """A graph of frame[y0:y1, x0:x1] whose filter outputs match that part of this frame's.
+
+        Filters with a halo (see tiledFilters.HALOS) only match away from
+        the crop's edges, so crop with a margin. The crop reports to this
+        graph's metrics.
+        """
+        top, left, full_h, full_w = self.region or (0, 0) + self.frame.shape[:2]
+        graph = FrameGraph(self.frame[y0:y1, x0:x1], scale=self.scale, metrics=self.metrics, tier=self.tier,
+                           region=(top + y0, left + x0, full_h, full_w))
+        graph.parent = (self, (y0, y1, x0, x1))
+        return graph
+
+    def output(self, filter_name):
+        """Filtered frame for one filter, reusing intermediates of this frame."""
+        if filter_name in SHARED_FILTERS:
+            inputs, func = SHARED_FILTERS[filter_name]
+            compute = lambda out: func(*[self.value(name) for name in inputs], out)
+        else:
+            compute = lambda out: filterChain.get_filter(filter_name)(self.frame, out=out)
+        if self.metrics is not None:
+            label = filter_name if self.parent is None else f"{filter_name}:partial"
+            compute = self.metrics.wrap("filter", compute, label)
+        return self._node(("filter", filter_name), compute)
+
+
+def apply_many(frame, filter_names, buffers=None, scale=1.0, metrics=None, tier="exact", temporal=None):
+    """Apply several filters to one frame; returns {filter name: output}.
+
+    Grayscale, BGRA and the 21x21 blur are computed once and shared by all
+    the filters that need them. See FrameGraph for `buffers`, `scale`,
+    `metrics`, `tier` and `temporal`.
+    """
+    graph = FrameGraph(frame, buffers, scale, metrics, tier, temporal)
+    return {name: graph.output(name) for name in filter_names}
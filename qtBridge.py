@@ -0,0 +1,83 @@
+import os
+import cv2
+import numpy as np
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QLabel
+
+# QImage formats whose memory layout matches OpenCV's uint8 frames as-is:
+# gray, BGR, and BGRA (which is ARGB32 on little-endian machines)
+HAS_BGR888 = hasattr(QImage, "Format_BGR888")  # Qt 5.14 and later
+FORMATS = {1: QImage.Format_Grayscale8, 4: QImage.Format_ARGB32}
+if HAS_BGR888:
+    FORMATS[3] = QImage.Format_BGR888
+
+
+def to_qimage(frame, buffer=None):
+    """Wrap an OpenCV frame (gray, BGR or BGRA) as a QImage without copying it.
+
+    Frames that are not uint8 with contiguous rows are first copied into
+    `buffer` (or a new array) once. The QImage holds a reference to the
+    array it reads, so the pixels stay valid for as long as the QImage.
+    """
+    channels = 1 if frame.ndim == 2 else frame.shape[2]
+    if channels == 3 and not HAS_BGR888:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    row_contiguous = frame.strides[-1] == 1 and (frame.ndim == 2 or frame.strides[1] == channels)
+    if frame.dtype != np.uint8 or not row_contiguous:
+        if buffer is None or buffer.shape != frame.shape:
+            buffer = np.empty(frame.shape, dtype=np.uint8)
+        np.copyto(buffer, frame, casting="unsafe")
+        frame = buffer
+    h, w = frame.shape[:2]
+    image = QImage(frame.data, w, h, frame.strides[0], FORMATS.get(channels, QImage.Format_RGB888))
+    image.frame = frame  # Keep the pixels alive with the image
+    return image
+
+
+class FrameDisplay:
+    """Puts OpenCV frames on QLabels, reusing one staging buffer and pixmap per label."""
+
+    def __init__(self):
+        self.buffers = {}
+        self.pixmaps = {}
+
+    def pixmap(self, key, frame):
+        """QPixmap of the frame, converted into the pixmap kept for `key`."""
+        image = to_qimage(frame, self.buffers.get(key))
+        if image.frame is not frame:
+            self.buffers[key] = image.frame
+        pixmap = self.pixmaps.get(key)
+        if pixmap is None or pixmap.size() != image.size():
+            pixmap = self.pixmaps[key] = QPixmap(image.size())
+        pixmap.convertFromImage(image)
+        return pixmap
+
+    def show(self, label, frame):
+        label.setPixmap(self.pixmap(label, frame))
+
+
+class MetricsOverlay(QLabel):
+    """Semi-transparent text box in the corner of a window showing Metrics.summary()."""
+
+    def __init__(self, parent, metrics, refresh_ms=500):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: white; font-family: monospace; padding: 4px;")
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+        self.move(8, 8)
+        self.show()
+
+    @classmethod
+    def attach(cls, parent, metrics):
+        """An overlay on `parent` when FILTER_METRICS=overlay, else None."""
+        if metrics.enabled and os.environ.get("FILTER_METRICS") == "overlay":
+            return cls(parent, metrics)
+        return None
+
+    def refresh(self):
+        self.setText(self.metrics.summary())
+        self.adjustSize()
+        self.raise_()
@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import functools
+import threading
+import cv2
+import numpy as np
+
+# Source files whose code decides what a filter outputs; editing any of them
+# changes the code version and so every cache key
+CODE_FILES = ("basicFilters.py", "instaFilters.py", "iphoneFilters.py", "filterChain.py", "filterEngine.py",
+              "multiFilter.py")
+HERE = os.path.dirname(os.path.abspath(__file__))
+# A writer's temporary file older than this was left behind by a killed process
+STALE_TEMP_SECONDS = 300
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Hash of the filter code and the OpenCV version, part of every key."""
+    digest = hashlib.blake2b(cv2.__version__.encode(), digest_size=16)
+    for name in CODE_FILES:
+        with open(os.path.join(HERE, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def image_digest(image):
+    """Content hash of an image's pixels, shape and dtype."""
+    digest = hashlib.blake2b(f"{image.shape}{image.dtype}".encode(), digest_size=20)
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Filter results on disk, keyed by the input's content and the filters that ran.
+
+    A key hashes the input pixels (image_digest), the filter names, any
+    parameters and code_version(), so results are reused across runs and
+    processes and never outlive a change to the filter code. Entries are
+    .npy files under two levels of shard directories
+    (ab/cd/abcd....npy). Writers save to a temporary file and rename it
+    into place, so concurrent writers and readers only ever see whole
+    entries.
+
+    The directory is kept under `max_bytes`: a hit refreshes the entry's
+    modification time, and once the writes of this process may have
+    pushed the total over the limit the oldest entries are deleted until
+    it is 90% full. Temporary files left by killed writers count towards
+    the size once they are STALE_TEMP_SECONDS old, and go first. hits, misses, writes and evictions are counted per
+    process (see stats(); usage() scans the directory).
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 2 ** 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "bytes_read": 0, "bytes_written": 0}
+        self.estimate = None  # Bytes on disk, as far as this process knows
+
+    def key(self, digest, filters, params=None):
+        text = "\0".join([digest, "+".join(filters), repr(sorted((params or {}).items())), code_version()])
+        return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:4], f"{key}.npy")
+
+    def _count(self, **changes):
+        with self.lock:
+            for name, value in changes.items():
+                self.counts[name] += value
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            result = np.load(path, allow_pickle=False)
+            os.utime(path)  # Most recently used
+        except (OSError, ValueError):
+            self._count(misses=1)  # Missing, evicted meanwhile or unreadable
+            return None
+        self._count(hits=1, bytes_read=result.nbytes)
+        return result
+
+    def put(self, key, result):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(result), allow_pickle=False)
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        size = os.path.getsize(path)
+        self._count(writes=1, bytes_written=size)
+        with self.lock:
+            if self.estimate is None:
+                self.estimate = self.usage()["bytes"]
+            else:
+                self.estimate += size
+            over = self.estimate > self.max_bytes
+        if over:
+            self.evict()
+
+    def apply(self, image, filters, compute, params=None, digest=None):
+        """compute()'s result for `filters` over `image`, from the cache when it is there.
+
+        Pass `digest` when the same image goes through several filters, so
+        it is hashed once.
+        """
+        key = self.key(digest or image_digest(image), filters, params)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def _entries(self):
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith((".npy", ".tmp")):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Evicted by another process
+                if name.endswith(".tmp") and now - stat.st_mtime < STALE_TEMP_SECONDS:
+                    continue  # Still being written
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self, target=0.9):
+        """Delete stale temporary files, then the least recently used entries until the cache is `target` full."""
+        entries = sorted(self._entries(), key=lambda entry: (not entry[2].endswith(".tmp"), entry))
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes * target and not path.endswith(".tmp"):
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except OSError:
+                pass  # Another process got there first
+            total -= size
+        self._count(evictions=evicted)
+        with self.lock:
+            self.estimate = total
+
+    def usage(self):
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self.lock:
+            self.estimate = 0
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = counts["hits"] / lookups if lookups else 0.0
+        return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or trim a filter result cache directory.")
+    parser.add_argument("directory")
+    parser.add_argument("--max-mb", type=float, help="evict least recently used entries down to this size")
+    parser.add_argument("--clear", action="store_true", help="delete every entry")
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.directory)
+    if args.clear:
+        cache.clear()
+    elif args.max_mb is not None:
+        cache.max_bytes = args.max_mb * 2 ** 20
+        cache.evict(target=1.0)
+    usage = cache.usage()
+    oldest = min((mtime for mtime, _, _ in cache._entries()), default=None)
+    print(f"{usage['entries']} entries, {usage['bytes'] / 2 ** 20:.1f} MB in {args.directory}")
+    if oldest is not None:
+        print(f"Least recently used entry: {(time.time() - oldest) / 3600:.1f} hours ago")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+import os
+import sys
+import time
+import queue
+import weakref
+import argparse
+import threading
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+
+from batchFilters import _init_worker
+from filterChain import FilterChain, parse_chain
+
+# Room for a BGRA result of the input's size, whatever the filter's output
+OUTPUT_CHANNELS = 4
+
+
+class SlotPool:
+    """Preallocated frame slots of one shape and dtype in a shared memory slab.
+
+    Each slot holds an input frame and room for its filtered output.
+    acquire() blocks while every slot is in use, which bounds the frames in
+    flight; release() hands a slot back.
+    """
+
+    def __init__(self, shape, dtype, slots):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.input_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.output_bytes = max(self.input_bytes, self.shape[0] * self.shape[1] * OUTPUT_CHANNELS * self.dtype.itemsize)
+        self.slot_bytes = self.input_bytes + self.output_bytes
+        self.memory = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        self.slots = slots
+        self.free = queue.Queue()
+        for index in range(slots):
+            self.free.put(index)
+        # Unlink the slab even if close() is never called
+        self._finalizer = weakref.finalize(self, _unlink, self.memory)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def acquire(self, timeout=None):
+        return self.free.get(timeout=timeout)
+
+    def release(self, index):
+        self.free.put(index)
+
+    def input(self, index):
+        return np.ndarray(self.shape, self.dtype, self.memory.buf, index * self.slot_bytes)
+
+    def output(self, index, shape, dtype):
+        return np.ndarray(shape, dtype, self.memory.buf, index * self.slot_bytes + self.input_bytes)
+
+    def close(self):
+        self._finalizer()
+
+
+def _unlink(memory):
+    memory.close()
+    memory.unlink()
+
+
+_slabs = {}  # Slab name -> SharedMemory attached in this worker process
+_chains = {}  # Filter names -> FilterChain of this worker process
+
+
+def _filter_slot(name, index, slot_bytes, input_bytes, output_bytes, shape, dtype, filters):
+    # Runs in a worker: only the slab name, slot index and frame layout were
+    # sent, and only the output's layout goes back
+    memory = _slabs.get(name)
+    if memory is None:
+        memory = _slabs[name] = shared_memory.SharedMemory(name=name)
+    start = index * slot_bytes
+    frame = np.ndarray(shape, dtype, memory.buf, start)
+    chain = _chains.get(filters)
+    if chain is None:
+        chain = _chains[filters] = FilterChain(filters)
+    result = chain.apply(frame)
+    if result.nbytes > output_bytes:
+        return result  # Doesn't fit the slot; sent back pickled
+    np.ndarray(result.shape, result.dtype, memory.buf, start + input_bytes)[...] = result
+    return result.shape, result.dtype.str
+
+
+def _filter_pickled(frame, filters):
+    # The same work for a plain process pool, which pickles the frame both ways
+    chain = _chains.get(filters)
+    if chain is None:
+        chain = _chains[filters] = FilterChain(filters)
+    return chain.apply(frame)
+
+
+class SharedFrameExecutor:
+    """Filters frames in worker processes, passing them through shared memory.
+
+    Filters that run Python per pixel (loops, np.vectorize, object arrays)
+    hold the GIL, so threads don't run them in parallel; a
+    ProcessPoolExecutor does, but pickles every frame to the worker and
+    every result back. Here the frame is copied into a slot of a SlotPool
+    for its shape and dtype (one pool per resolution, created on first
+    use), the worker filters it in place and writes the result into the
+    same slot, and only the slot index and array layouts cross the process
+    boundary.
+
+    submit() blocks while all `slots` of a resolution are in flight. A
+    slot is recycled as soon as its result has been copied out, or its
+    task failed. When a worker dies the pending frames fail with
+    BrokenProcessPool, their slots are recycled, and the next submit()
+    starts a fresh pool. The slabs belong to this process and are unlinked
+    on shutdown().
+    """
+
+    def __init__(self, workers=None, slots=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.slots = slots or 2 * self.workers
+        self.pools = {}  # (shape, dtype) -> SlotPool
+        self.lock = threading.Lock()
+        self.restarts = 0
+        self.pool = self._start()
+
+    def _start(self):
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def _slot_pool(self, frame):
+        key = (frame.shape, frame.dtype.str)
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = self.pools[key] = SlotPool(frame.shape, frame.dtype, self.slots)
+            return pool
+
+    def submit(self, frame, filters):
+        """Filter one frame; the Future resolves to the filtered frame."""
+        filters = tuple(filters)
+        slots = self._slot_pool(frame)
+        index = slots.acquire()
+        slots.input(index)[...] = frame
+        future = concurrent.futures.Future()
+        args = (slots.name, index, slots.slot_bytes, slots.input_bytes, slots.output_bytes, slots.shape,
+                slots.dtype.str, filters)
+        try:
+            with self.lock:
+                try:
+                    task = self.pool.submit(_filter_slot, *args)
+                except BrokenProcessPool:
+                    # A worker died; the frames it took down have failed already
+                    self.pool.shutdown(wait=False)
+                    self.pool = self._start()
+                    self.restarts += 1
+                    task = self.pool.submit(_filter_slot, *args)
+        except BaseException:
+            slots.release(index)
+            raise
+        task.add_done_callback(lambda task: self._finish(task, future, slots, index))
+        return future
+
+    def _finish(self, task, future, slots, index):
+        try:
+            result = task.result()
+            if isinstance(result, tuple):
+                shape, dtype = result
+                result = slots.output(index, shape, dtype).copy()
+        except BaseException as error:
+            slots.release(index)
+            future.set_exception(error)
+            return
+        slots.release(index)
+        future.set_result(result)
+
+    def map(self, frames, filters):
+        """Filtered frames in order, with up to `slots` of them in flight."""
+        pending = []
+        for frame in frames:
+            pending.append(self.submit(frame, filters))
+            while pending and pending[0].done():
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+        with self.lock:
+            for pool in self.pools.values():
+                pool.close()
+            self.pools.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+def _bounded(submit, frames, in_flight):
+    # Submit frames keeping at most `in_flight` outstanding, like the executor's slots
+    pending = []
+    for frame in frames:
+        if len(pending) >= in_flight:
+            pending.pop(0).result()
+        pending.append(submit(frame))
+    for future in pending:
+        future.result()
+
+
+def benchmark(filters, shape=(1080, 1920, 3), frames=100, workers=None):
+    """Frames per second of threads, a pickling process pool and SharedFrameExecutor."""
+    workers = workers or os.cpu_count() or 1
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, shape, dtype=np.uint8) for _ in range(4)]
+    batch = [images[i % len(images)] for i in range(frames)]
+    filters = tuple(filters)
+    results = {}
+
+    local = threading.local()
+
+    def threaded(frame):
+        # One chain per thread: a chain keeps per-call state
+        if not hasattr(local, "chain"):
+            local.chain = FilterChain(filters)
+        return local.chain.apply(frame)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        _bounded(lambda frame: pool.submit(threaded, frame), batch[:workers], 2 * workers)  # Warm up
+        start = time.perf_counter()
+        _bounded(lambda frame: pool.submit(threaded, frame), batch, 2 * workers)
+        results["threads"] = frames / (time.perf_counter() - start)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        _bounded(lambda frame: pool.submit(_filter_pickled, frame, filters), batch[:workers], 2 * workers)
+        start = time.perf_counter()
+        _bounded(lambda frame: pool.submit(_filter_pickled, frame, filters), batch, 2 * workers)
+        results["pickle"] = frames / (time.perf_counter() - start)
+
+    with SharedFrameExecutor(workers) as executor:
+        list(executor.map(batch[:workers], filters))
+        start = time.perf_counter()
+        for _ in executor.map(batch, filters):
+            pass
+        results["shared"] = frames / (time.perf_counter() - start)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare thread, pickling process and shared memory pools.")
+    # Portrait Mode's float64 blend is the most NumPy work of the built-in filters
+    parser.add_argument("-f", "--filter", type=parse_chain, default="Portrait Mode", help='filter name; join names with "+" to chain')
+    parser.add_argument("--size", default="1920x1080", help="frame size as WIDTHxHEIGHT")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("-j", "--workers", type=int, help="threads or processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    width, height = map(int, args.size.lower().split("x"))
+
+    results = benchmark(args.filter, (height, width, 3), args.frames, args.workers)
+    for name, fps in results.items():
+        print(f"{name:<8} {fps:8.1f} fps  {fps / results['threads']:5.2f}x threads")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
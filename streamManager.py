@@ -0,0 +1,305 @@
+import sys
+import time
+import argparse
+import threading
+import collections
+import concurrent.futures
+import cv2
+
+from filterChain import FilterChain, parse_chain
+from metrics import Histogram
+
+# What a stream does with a new frame while earlier ones wait for a worker
+DROP_POLICIES = ("latest", "drop-oldest", "block")
+
+
+class Stream:
+    """One camera or video file, read on its own thread, with its own filters.
+
+    `policy` decides what happens to frames the workers have not got to:
+    "latest" keeps only the newest (live cameras), "drop-oldest" keeps up
+    to `queue_size` and drops the oldest, "block" pauses the reader until
+    there is room (recordings that must not lose frames).
+
+    A video file stands in for a camera with `realtime=True` (frames
+    arrive at the file's frame rate) and `loop=True` (it starts over at
+    the end).
+    """
+
+    def __init__(self, name, source, filters, policy="latest", queue_size=4, realtime=False, loop=False,
+                 on_frame=None):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"policy must be one of {DROP_POLICIES}")
+        self.name = name
+        self.source = source
+        self.set_filters(filters)
+        self.policy = policy
+        self.pending = collections.deque(maxlen=1 if policy == "latest" else queue_size)
+        self.queue_size = self.pending.maxlen
+        self.realtime = realtime
+        self.loop = loop
+        self.on_frame = on_frame  # Called on a worker thread with (stream, output, captured_at)
+        self.lock = threading.Condition()
+        self.running = False
+        self.finished = False  # The source has no more frames
+        self.thread = None
+        # Scheduling and statistics; guarded by the manager's lock
+        self.in_flight = 0
+        self.served = 0.0  # Worker seconds spent on this stream
+        self.captured = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.done = collections.deque(maxlen=30)  # Times the latest frames were filtered
+        self.latency = Histogram()  # Capture to filtered, per frame
+        self.output = None  # Newest filtered frame
+
+    def set_filters(self, filters):
+        """Switch the stream to other filters; applies from the next frame."""
+        self.filters = list(filters)
+        self.chain = FilterChain(self.filters)
+
+    def start(self, ready):
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            self.cap.release()
+            raise ValueError(f"Cannot open {self.source!r}")
+        self.ready = ready  # Notified when a frame is pending
+        self.running = True
+        self.thread = threading.Thread(target=self._read_loop, name=f"Stream-{self.name}", daemon=True)
+        self.thread.start()
+
+    def _read_loop(self):
+        interval = 1.0 / (self.cap.get(cv2.CAP_PROP_FPS) or 30.0) if self.realtime else 0.0
+        next_frame = time.perf_counter()
+        since_rewind = 0
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.loop and since_rewind and self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                    since_rewind = 0
+                    continue
+                if isinstance(self.source, int):
+                    time.sleep(0.01)  # Camera not ready or unplugged; don't spin on it
+                    continue
+                break
+            since_rewind += 1
+            if interval:
+                next_frame += interval
+                time.sleep(max(0.0, next_frame - time.perf_counter()))
+            captured_at = time.perf_counter()
+            with self.lock:
+                if self.policy == "block":
+                    while self.running and len(self.pending) == self.queue_size:
+                        self.lock.wait(0.1)
+                elif len(self.pending) == self.queue_size:
+                    self.dropped += 1  # The deque drops the oldest frame
+                self.pending.append((frame, captured_at))
+                self.captured += 1
+            self.ready()
+        # Released here rather than in stop(), which may give up waiting while read() still runs
+        self.cap.release()
+        with self.lock:
+            self.finished = True
+        self.ready()
+
+    def take(self):
+        """The next frame for a worker, as (frame, captured_at), or None."""
+        with self.lock:
+            if not self.pending:
+                return None
+            item = self.pending.popleft()
+            self.lock.notify_all()  # A blocked reader may go on
+            return item
+
+    def has_pending(self):
+        with self.lock:
+            return bool(self.pending)
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            self.lock.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    @property
+    def fps(self):
+        """Filtered frames per second over the latest frames."""
+        if len(self.done) < 2 or self.done[-1] == self.done[0]:
+            return 0.0
+        return (len(self.done) - 1) / (self.done[-1] - self.done[0])
+
+    def snapshot(self):
+        return {
+            "source": self.source,
+            "filters": self.filters,
+            "policy": self.policy,
+            "fps": self.fps,
+            "captured": self.captured,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "worker_seconds": self.served,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class StreamManager:
+    """Filters several streams at once on one shared pool of worker threads.
+
+    A dispatcher thread hands pending frames to the workers, always from
+    the ready stream that has used the least worker time so far, so a
+    stream with expensive filters or a high frame rate cannot starve the
+    others. Each stream has at most `per_stream` frames being filtered at
+    a time, which also keeps its outputs in order at the default of one.
+    Frames that wait too long are dropped by each stream's own policy.
+
+    snapshot() reports every stream's FPS, latency from capture to
+    filtered frame, and dropped frames.
+    """
+
+    def __init__(self, workers=4, per_stream=1):
+        self.workers = workers
+        self.per_stream = per_stream
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="StreamManager")
+        self.streams = {}
+        self.lock = threading.Condition()
+        self.free = workers
+        self.running = True
+        self.dispatcher = threading.Thread(target=self._dispatch, name="StreamManager-dispatch", daemon=True)
+        self.dispatcher.start()
+
+    def add(self, name, source, filters, **options):
+        """Start filtering a camera (index) or video file (path); options go to Stream."""
+        stream = Stream(name, source, filters, **options)
+        with self.lock:
+            if name in self.streams:
+                raise ValueError(f"Stream {name!r} already exists")
+            # A new stream joins at the least-served level instead of owing the others
+            stream.served = min((other.served for other in self.streams.values()), default=0.0)
+            self.streams[name] = stream
+        try:
+            stream.start(self._wake)
+        except Exception:
+            with self.lock:
+                del self.streams[name]
+            raise
+        return stream
+
+    def remove(self, name):
+        with self.lock:
+            stream = self.streams.pop(name)
+        stream.stop()
+
+    def _wake(self):
+        with self.lock:
+            self.lock.notify_all()
+
+    def _next_stream(self):
+        ready = [stream for stream in self.streams.values()
+                 if stream.in_flight < self.per_stream and stream.has_pending()]
+        return min(ready, key=lambda stream: stream.served, default=None)
+
+    def _dispatch(self):
+        while True:
+            with self.lock:
+                while self.running and (self.free == 0 or (stream := self._next_stream()) is None):
+                    self.lock.wait(0.1)
+                if not self.running:
+                    return
+                item = stream.take()
+                if item is None:
+                    continue
+                stream.in_flight += 1
+                self.free -= 1
+            self.pool.submit(self._process, stream, *item)
+
+    def _process(self, stream, frame, captured_at):
+        start = time.perf_counter()
+        output = None
+        try:
+            output = stream.chain.apply(frame)
+            if stream.on_frame is not None:
+                stream.on_frame(stream, output, captured_at)
+        except Exception as error:
+            print(f"Stream {stream.name}: {error}", file=sys.stderr)
+        done = time.perf_counter()
+        with self.lock:
+            stream.in_flight -= 1
+            stream.served += done - start
+            self.free += 1
+            if output is None:
+                stream.errors += 1
+            else:
+                stream.output = output
+                stream.processed += 1
+                stream.latency.observe((done - captured_at) * 1000)
+                stream.done.append(done)
+            self.lock.notify_all()
+
+    def idle(self):
+        """True when every stream's source has ended and all its frames are filtered."""
+        with self.lock:
+            return all(stream.finished and not stream.has_pending() and not stream.in_flight
+                       for stream in self.streams.values())
+
+    def snapshot(self):
+        with self.lock:
+            return {name: stream.snapshot() for name, stream in self.streams.items()}
+
+    def shutdown(self):
+        for stream in list(self.streams.values()):
+            stream.stop()
+        with self.lock:
+            self.running = False
+            self.lock.notify_all()
+        self.dispatcher.join()
+        self.pool.shutdown(wait=True)
+
+
+def _source(text):
+    # "0" is the first camera; anything else is a file path or URL
+    return int(text) if text.isdigit() else text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filter several camera or video streams at once on shared workers.")
+    parser.add_argument("-s", "--stream", nargs=2, action="append", required=True, metavar=("SOURCE", "FILTERS"),
+                        help='camera index or video file, and filters joined with "+"; repeat for more streams')
+    parser.add_argument("-j", "--workers", type=int, default=4, help="filter threads shared by all streams")
+    parser.add_argument("--policy", choices=DROP_POLICIES, default="latest",
+                        help="what to do with frames the workers fall behind on")
+    parser.add_argument("--queue-size", type=int, default=4, help="frames kept per stream (drop-oldest, block)")
+    parser.add_argument("--realtime", action="store_true", help="read video files at their frame rate, like cameras")
+    parser.add_argument("--loop", action="store_true", help="start video files over at the end")
+    parser.add_argument("--seconds", type=float, default=10.0, help="run time (files without --loop may end sooner)")
+    args = parser.parse_args(argv)
+
+    try:
+        streams = [(source, parse_chain(spec)) for source, spec in args.stream]
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+
+    manager = StreamManager(args.workers)
+    try:
+        for index, (source, names) in enumerate(streams):
+            manager.add(f"{index}:{source}", _source(source), names, policy=args.policy,
+                        queue_size=args.queue_size, realtime=args.realtime, loop=args.loop)
+        deadline = time.perf_counter() + args.seconds
+        while time.perf_counter() < deadline and not manager.idle():
+            time.sleep(0.1)
+        stats = manager.snapshot()
+    finally:
+        manager.shutdown()
+
+    for name, stream in stats.items():
+        latency = stream["latency"]
+        print(f"{name:<30} {'+'.join(stream['filters']):<20} {stream['fps']:6.1f} fps  "
+              f"latency p50 {latency['p50_ms']:6.1f} ms  p99 {latency['p99_ms']:6.1f} ms  "
+              f"{stream['processed']} filtered, {stream['dropped']} dropped")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import sys
+import math
+import time
+import threading
+import concurrent.futures
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class TileRenderer(QObject):
+    """Renders the tiles of a filter grid concurrently on a thread pool.
+
+    Each finished tile is published through `tile_ready(index, frame, stamp)`,
+    which Qt delivers on the GUI thread; `stamp` is the one passed to
+    render() for that frame (by default the time render() was called).
+    When a tile's filter raises, the error is printed once (until the tile
+    renders again) and the tile is published with frame None.
+
+    A tile never has more than one render in flight, and a tile whose filter
+    takes longer than `budget_ms` is only refreshed every few ticks so it
+    cannot hold back the rest of the grid. `throttle` is a minimum refresh
+    interval, in ticks, for every tile but the priority one; a
+    FrameScheduler raises it under load.
+    """
+
+    tile_ready = pyqtSignal(int, object, float)
+
+    def __init__(self, filter_funcs, budget_ms=30, workers=None):
+        super().__init__()
+        self.filter_funcs = list(filter_funcs)
+        self.budget = budget_ms / 1000.0
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)  # ThreadPoolExecutor's default
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="TileRenderer")
+        self.lock = threading.Lock()
+        self.busy = [False] * len(self.filter_funcs)
+        self.cost = [0.0] * len(self.filter_funcs)  # Smoothed seconds per render
+        self.failing = [False] * len(self.filter_funcs)
+        self.errors = 0
+        self.tick = 0
+        self.throttle = 1
+
+    def refresh_interval(self, index):
+        """Ticks between refreshes of a tile, from its cost against the budget."""
+        return max(1, math.ceil(self.cost[index] / self.budget))
+
+    def load(self):
+        """Seconds of tile work per tick for each worker, at the current refresh intervals."""
+        work = sum(self.cost[index] / max(self.throttle, self.refresh_interval(index))
+                   for index in range(len(self.filter_funcs)))
+        return work / self.workers
+
+    def render(self, frame, priority=None, stamp=None):
+        """Queue the tiles that are due this tick; `priority` is refreshed every tick."""
+        if stamp is None:
+            stamp = time.perf_counter()
+        self.tick += 1
+        for index in range(len(self.filter_funcs)):
+            with self.lock:
+                if self.busy[index]:
+                    continue
+                if index != priority and self.tick % max(self.throttle, self.refresh_interval(index)):
+                    continue
+                self.busy[index] = True
+            self.pool.submit(self._render_tile, index, frame, stamp)
+
+    def _render_tile(self, index, frame, stamp):
+        start = time.perf_counter()
+        result = None
+        try:
+            result = self.filter_funcs[index](frame)
+        except Exception as error:
+            with self.lock:
+                self.errors += 1
+                first = not self.failing[index]
+            if first:
+                # A broken filter fails every tick; one line until it recovers
+                print(f"Tile {index}: {type(error).__name__}: {error}", file=sys.stderr)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.cost[index] = elapsed if not self.cost[index] else 0.8 * self.cost[index] + 0.2 * elapsed
+                self.busy[index] = False
+                self.failing[index] = result is None
+        self.tile_ready.emit(index, result, stamp)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import argparse
+import concurrent.futures
+import cv2
+import numpy as np
+
+import basicFilters
+from filterChain import FilterChain, parse_chain
+
+# Pixels of context each filter needs around a tile so that the tile's core
+# comes out as in a whole-image run. Pointwise filters need none. The
+# GaussianBlur/filter2D radii are exact. Canny's hysteresis and the
+# edge-preserving detailEnhance/pencilSketch filters have unbounded
+# support, so their halos cover the visible range and tile seams match
+# closely rather than bit for bit.
+HALOS = {
+    "Blur": 10,            # GaussianBlur 21x21
+    "Portrait Mode": 10,   # GaussianBlur 21x21
+    "Sharpen": 1,          # filter2D 3x3
+    "Sketch": 16,          # GaussianBlur 5x5 + Canny
+    "HDR": 48,             # detailEnhance, sigma_s=12
+    "Pencil Sketch": 192,  # pencilSketch, sigma_s=60
+}
+
+
+def chain_halo(filters):
+    return sum(HALOS.get(name, 0) for name in filters)
+
+
+def open_source(path, shape=None, dtype=np.uint8):
+    """Memory-map an .npy file, or a raw file given its (h, w[, c]) shape."""
+    if shape is None:
+        return np.load(path, mmap_mode="r")
+    return np.memmap(path, dtype=dtype, mode="r", shape=tuple(shape))
+
+
+def _as_bgr(region):
+    if region.ndim == 2:
+        return cv2.cvtColor(region, cv2.COLOR_GRAY2BGR)
+    if region.shape[2] == 4:
+        return cv2.cvtColor(region, cv2.COLOR_BGRA2BGR)
+    return region
+
+
+def _apply_region(region, filters, top, left, full_h, full_w):
+    # Blur's vignette depends on where the pixels are in the whole image, so
+    # it is built for this region; everything else runs as fused chains.
+    pending = []
+    for name in filters:
+        if name != "Blur":
+            pending.append(name)
+            continue
+        if pending:
+            region = FilterChain(pending).apply(region)
+            pending = []
+        h, w = region.shape[:2]
+        vignette = basicFilters.vignette_weights(full_h, full_w, (top, left, h, w))
+        region = basicFilters.apply_blur(_as_bgr(region), vignette=vignette)
+    if pending:
+        region = FilterChain(pending).apply(region)
+    return region
+
+
+def _output_layout(source, filters):
+    # Run the chain on a small blank patch to learn the output channels and dtype
+    sample = np.zeros((64, 64) + source.shape[2:], dtype=source.dtype)
+    result = _apply_region(sample, filters, 0, 0, 64, 64)
+    return result.shape[2:], result.dtype
+
+
+def _process_tile(source, destination, filters, halo, top, left, tile_h, tile_w):
+    full_h, full_w = source.shape[:2]
+    # Read the tile plus its halo, clipped to the image; at the image border
+    # the filters then see the same border handling as a whole-image run
+    y0, x0 = max(top - halo, 0), max(left - halo, 0)
+    y1, x1 = min(top + tile_h + halo, full_h), min(left + tile_w + halo, full_w)
+    region = np.array(source[y0:y1, x0:x1])
+    result = _apply_region(region, filters, y0, x0, full_h, full_w)
+    destination[top:top + tile_h, left:left + tile_w] = result[top - y0:top - y0 + tile_h, left - x0:left - x0 + tile_w]
+
+
+def run_tiled(source, output_path, filters, tile=1024, workers=None):
+    """Filter a (memory-mapped) image tile by tile into a memory-mapped .npy.
+
+    Tiles run in parallel with at most two per worker in flight, so memory
+    use follows the tile size (plus halo), not the image size.
+    """
+    workers = workers or os.cpu_count() or 1
+    full_h, full_w = source.shape[:2]
+    channels, dtype = _output_layout(source, filters)
+    destination = np.lib.format.open_memmap(output_path, mode="w+", dtype=dtype, shape=(full_h, full_w) + channels)
+    halo = chain_halo(filters)
+    tiles = [(top, left, min(tile, full_h - top), min(tile, full_w - left))
+             for top in range(0, full_h, tile) for left in range(0, full_w, tile)]
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for tile_args in tiles:
+            if len(pending) >= workers * 2:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(pool.submit(_process_tile, source, destination, filters, halo, *tile_args))
+        for future in concurrent.futures.as_completed(pending):
+            future.result()
+    destination.flush()
+    return {"tiles": len(tiles), "seconds": time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply photo filters to very large images tile by tile.")
+    parser.add_argument("source", help=".npy image, or a raw file together with --raw-shape")
+    parser.add_argument("output", help="output .npy file (memory-mapped while it is written)")
+    parser.add_argument("-f", "--filter", type=parse_chain, required=True,
+                        help='filter name from any module; join names with "+" to chain them')
+    parser.add_argument("--raw-shape", help="height,width[,channels] of a raw uint8 source")
+    parser.add_argument("--tile", type=int, default=1024, help="tile edge in pixels")
+    parser.add_argument("-j", "--workers", type=int, help="tile threads (default: CPU count)")
+    args = parser.parse_args(argv)
+
+
+    shape = [int(n) for n in args.raw_shape.split(",")] if args.raw_shape else None
+    source = open_source(args.source, shape)
+    stats = run_tiled(source, args.output, args.filter, args.tile, args.workers)
+    print(f"Processed {stats['tiles']} tiles of {source.shape[1]}x{source.shape[0]} in {stats['seconds']:.2f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
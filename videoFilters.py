@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+import cv2
+
+from filterChain import FilterChain, parse_chain
+from sharedFrames import SharedFrameExecutor
+
+
+class StageTimer:
+    """Busy time of one pipeline stage, summed over its worker threads."""
+
+    def __init__(self, name, lanes=1):
+        self.name = name
+        self.lanes = lanes
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.busy += seconds
+
+    def utilisation(self, wall):
+        return self.busy / (wall * self.lanes) if wall > 0 else 0.0
+
+
+def _writable(frame):
+    # VideoWriter wants BGR; gray (Sketch, Mono, ...) and BGRA results are converted
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return frame
+
+
+def run_video(input_path, output_path, filters, workers=None, queue_size=8, fourcc="mp4v", processes=False):
+    """Filter a video file through decode -> filter -> encode stages.
+
+    The stages run on their own threads connected by bounded queues. The
+    filter stage has `workers` threads, and the encoder restores frame
+    order. With `processes` each filter thread hands its frames to a
+    worker process through shared memory (sharedFrames), for filters that
+    hold the GIL. Returns a stats dict with frames, seconds and the utilisation
+    of each stage, so the bottleneck is the stage closest to 1.0.
+    """
+    workers = workers or os.cpu_count() or 1
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video {input_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    decoded = queue.Queue(maxsize=queue_size)
+    filtered = queue.Queue(maxsize=queue_size)
+    # Frames decoded but not yet written; bounds the reorder buffer too
+    in_flight = threading.Semaphore(queue_size + workers)
+    timers = {"decode": StageTimer("decode"), "filter": StageTimer("filter", workers),
+              "encode": StageTimer("encode")}
+    errors = []
+    stop = threading.Event()
+    executor = SharedFrameExecutor(workers) if processes else None
+
+    def decode():
+        index = 0
+        try:
+            while not stop.is_set():
+                # Time out now and then so a failure elsewhere can stop decoding
+                if not in_flight.acquire(timeout=0.1):
+                    continue
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                timers["decode"].add(time.perf_counter() - start)
+                if not ret or not put((index, frame)):
+                    in_flight.release()
+                    break
+                index += 1
+        except Exception as error:
+            errors.append(error)
+            stop.set()
+        finally:
+            # The filter threads take frames until they see these, even after a failure
+            for _ in range(workers):
+                decoded.put(None)
+
+    def put(item):
+        # False once the pipeline stops; a blocking put could wait on a queue nobody reads
+        while not stop.is_set():
+            try:
+                decoded.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def filter_frames():
+        chain = FilterChain(filters)  # Each worker has its own plan cache and pass counter
+        while True:
+            item = decoded.get()
+            if item is None:
+                break
+            index, frame = item
+            start = time.perf_counter()
+            if not stop.is_set():
+                try:
+                    frame = chain.apply(frame) if executor is None else executor.submit(frame, filters).result()
+                except Exception as error:
+                    # Go on taking frames, unfiltered, so decoding is never stuck on a full queue
+                    errors.append(error)
+                    stop.set()
+            timers["filter"].add(time.perf_counter() - start)
+            filtered.put((index, frame))
+        filtered.put(None)
+
+    threads = [threading.Thread(target=decode, name="decode")]
+    threads += [threading.Thread(target=filter_frames, name=f"filter-{i}") for i in range(workers)]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    # Encode on this thread, writing frames back in their original order
+    writer = None
+    pending = {}
+    next_index = 0
+    finished = 0
+    try:
+        while finished < workers:
+            item = filtered.get()
+            if item is None:
+                finished += 1
+                continue
+            pending[item[0]] = item[1]
+            while next_index in pending:
+                frame = pending.pop(next_index)
+                start = time.perf_counter()
+                if not stop.is_set():
+                    frame = _writable(frame)
+                    if writer is None:
+                        h, w = frame.shape[:2]
+                        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+                        if not writer.isOpened():
+                            raise ValueError(f"Cannot write video {output_path}")
+                    writer.write(frame)
+                timers["encode"].add(time.perf_counter() - start)
+                next_index += 1
+                in_flight.release()
+    except Exception as error:
+        errors.append(error)
+        stop.set()
+        # Keep draining so the other stages can finish
+        while finished < workers:
+            item = filtered.get()
+            if item is None:
+                finished += 1
+            else:
+                in_flight.release()
+    finally:
+        for thread in threads:
+            thread.join()
+        cap.release()
+        if writer is not None:
+            writer.release()
+        if executor is not None:
+            executor.shutdown()
+    if errors:
+        raise errors[0]
+
+    wall = time.perf_counter() - wall_start
+    return {
+        "frames": next_index,
+        "seconds": wall,
+        "utilisation": {name: timer.utilisation(wall) for name, timer in timers.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply photo filters to a recorded video.")
+    parser.add_argument("input", help="input video file")
+    parser.add_argument("output", help="output video file")
+    parser.add_argument("-f", "--filter", type=parse_chain, required=True,
+                        help='filter name from any module; join names with "+" to chain them')
+    parser.add_argument("-j", "--workers", type=int, help="filter threads (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=8, help="frames buffered between stages")
+    parser.add_argument("--fourcc", default="mp4v", help="codec of the output video")
+    parser.add_argument("--processes", action="store_true",
+                        help="filter in worker processes, for filters that don't release the GIL")
+    args = parser.parse_args(argv)
+
+
+    stats = run_video(args.input, args.output, args.filter, args.workers, args.queue_size, args.fourcc, args.processes)
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"Processed {stats['frames']} frames in {seconds:.2f} s ({stats['frames'] / seconds:.1f} fps)")
+    print("Stage utilisation: " + ", ".join(f"{name} {value:.0%}" for name, value in stats["utilisation"].items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())